@@ -2,6 +2,7 @@ import os
 import sys
 import tempfile
 import asyncio
+from bisect import bisect_left
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status, UploadFile
 
@@ -11,7 +12,7 @@ if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
 from utils.pdf_processor import PDFProcessor
-from utils.risk_detector import RiskDetector
+from utils.risk_detector import RiskDetector, AI_ANALYSIS_CONCURRENCY
 from utils.clause_rewriter import ClauseRewriter
 from utils.diff_generator import DiffGenerator
 from utils.export_manager import ExportManager
@@ -67,31 +68,46 @@ class DocumentService:
 
     async def _stream_risk_analysis(self, job_id: str, document_data: Dict[str, Any]):
         """Stream risk analysis results as each clause is processed"""
+        tasks = []
         try:
             risky_clauses = []
+            # Clause index of each entry in risky_clauses, which is kept in document order
+            risky_indices = []
             total_clauses = len(document_data['clauses'])
             
-            for i, clause in enumerate(document_data['clauses']):
+            # Analyses block on Gemini, so they run on executor threads, a bounded number at a time
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(AI_ANALYSIS_CONCURRENCY)
+            
+            async def analyze(index, clause):
+                async with semaphore:
+                    return index, clause, await loop.run_in_executor(None, self.risk_detector._analyze_clause, clause)
+            
+            tasks = [asyncio.create_task(analyze(i, clause)) for i, clause in enumerate(document_data['clauses'])]
+            
+            for processed, next_result in enumerate(asyncio.as_completed(tasks), start=1):
                 # Analyze this clause
-                risk_analysis = self.risk_detector._analyze_clause(clause)
+                i, clause, risk_analysis = await next_result
                 
                 if risk_analysis['score'] >= 1:
                     clause_with_risk = clause.copy()
                     clause_with_risk['risk_analysis'] = risk_analysis
-                    risky_clauses.append(clause_with_risk)
+                    position = bisect_left(risky_indices, i)
+                    risky_indices.insert(position, i)
+                    risky_clauses.insert(position, clause_with_risk)
                     
                     # Update job with partial results
                     partial_result = {
                         'document': document_data,
                         'risky_clauses': risky_clauses,
                         'streaming_complete': False,
-                        'processed_clauses': i + 1,
+                        'processed_clauses': processed,
                         'total_clauses': total_clauses
                     }
                     job_queue.update_job_result(job_id, partial_result)
                 
                 # Update progress
-                progress = 70 + int((i + 1) / total_clauses * 20)  # 70-90%
+                progress = 70 + int(processed / total_clauses * 20)  # 70-90%
                 job_queue.update_progress(job_id, progress)
             
             # Sort by risk score and finalize
@@ -109,6 +125,8 @@ class DocumentService:
             job_queue.complete_job(job_id, final_result)
             
         except Exception as e:
+            for task in tasks:
+                task.cancel()
             job_queue.fail_job(job_id, str(e))
 
 class ClauseService:
@@ -0,0 +1,67 @@
+import unittest
+
+from utils.diff_generator import DiffGenerator
+
+
+ORIGINAL = "1. Term\nThe agreement lasts one year.\nEither party may terminate with notice."
+REWRITTEN = "1. Term\nThe agreement lasts two years.\nEither party may terminate with 30 days notice."
+
+
+class MemoizedDiffTest(unittest.TestCase):
+    """Cached diff results must not be shared with callers"""
+
+    def setUp(self):
+        self.generator = DiffGenerator()
+
+    def test_mutating_structured_diff_does_not_corrupt_cache(self):
+        first = self.generator.generate_structured_diff(ORIGINAL, REWRITTEN)
+        expected_stats = dict(first['stats'])
+        first['stats']['additions'] = -1
+        first['original_lines'].clear()
+
+        second = self.generator.generate_structured_diff(ORIGINAL, REWRITTEN)
+        self.assertEqual(second['stats'], expected_stats)
+        self.assertTrue(second['original_lines'])
+
+    def test_mutating_summary_does_not_corrupt_cache(self):
+        summary = self.generator.generate_summary_diff(ORIGINAL, REWRITTEN)
+        unchanged = summary['unchanged']
+        summary['unchanged'] = -1
+
+        self.assertEqual(self.generator.generate_summary_diff(ORIGINAL, REWRITTEN)['unchanged'], unchanged)
+
+    def test_mutating_opcode_stream_does_not_corrupt_cache(self):
+        stream = self.generator.generate_opcode_stream(ORIGINAL, REWRITTEN)
+        opcodes = list(stream['opcodes'])
+        stream['opcodes'].clear()
+        stream['rewritten_lines'].append('injected')
+
+        again = self.generator.generate_opcode_stream(ORIGINAL, REWRITTEN)
+        self.assertEqual(again['opcodes'], opcodes)
+        self.assertNotIn('injected', again['rewritten_lines'])
+
+    def test_default_and_explicit_arguments_share_one_entry(self):
+        self.generator.generate_html_diff(ORIGINAL, REWRITTEN)
+        self.generator.generate_html_diff(ORIGINAL, REWRITTEN, 3)
+        self.generator.generate_html_diff(ORIGINAL, REWRITTEN, context_lines=3)
+
+        self.assertEqual(len(self.generator._diff_cache), 2)  # the HTML diff and the opcode stream it reuses
+
+
+
+class WhitespaceOnlyDiffTest(unittest.TestCase):
+    """Lines aligned by normalization are still reported when their raw text differs"""
+
+    def test_whitespace_edit_is_not_reported_as_identical(self):
+        original = "1. Term\nThe  agreement lasts one year.\nEnd."
+        rewritten = "1. Term\nThe agreement lasts one year.  \nEnd."
+        generator = DiffGenerator()
+
+        html_diff = generator.generate_html_diff(original, rewritten)
+        self.assertNotIn('identical', html_diff)
+        self.assertIn('diff_chg', html_diff)
+        self.assertEqual(generator.generate_structured_diff(original, rewritten)['stats']['modifications'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
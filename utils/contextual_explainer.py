@@ -7,7 +7,7 @@ import os
 import re
 import json
 from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from dotenv import load_dotenv
 from google.cloud import aiplatform
 from google.cloud import discoveryengine_v1 as discoveryengine
@@ -44,6 +44,82 @@ class ClauseAnalysis:
     historical_context: str
     negotiation_tips: List[str]
 
+# Built-in explanations for common terms, used when AI services are unavailable
+_BASIC_KNOWLEDGE: Dict[str, LegalExplanation] = {
+    'force majeure': LegalExplanation(
+        term='force majeure',
+        plain_english='Unforeseeable circumstances that prevent a party from fulfilling a contract, like natural disasters or wars.',
+        legal_definition='A clause that frees parties from liability when extraordinary circumstances beyond their control prevent them from fulfilling their obligations.',
+        real_world_impact='Allows parties to suspend or terminate contracts during major disruptions without penalty.',
+        alternatives=['Act of God clause', 'Impossibility clause', 'Frustration of purpose'],
+        risk_level='Medium',
+        citations=['Built-in legal knowledge base']
+    ),
+    'liquidated damages': LegalExplanation(
+        term='liquidated damages',
+        plain_english='A predetermined amount of money that must be paid if someone breaks the contract.',
+        legal_definition='A contractual provision that establishes a specific monetary penalty for breach, agreed upon in advance.',
+        real_world_impact='Provides certainty about consequences and avoids lengthy disputes over actual damages.',
+        alternatives=['Penalty clause', 'Stipulated damages', 'Pre-estimated damages'],
+        risk_level='High',
+        citations=['Built-in legal knowledge base']
+    ),
+    'indemnification': LegalExplanation(
+        term='indemnification',
+        plain_english='A promise to cover someone else\'s losses and legal costs if they get in trouble because of you.',
+        legal_definition='A contractual obligation where one party agrees to compensate another for harm, loss, or damage.',
+        real_world_impact='Shifts financial risk and legal responsibility from one party to another.',
+        alternatives=['Hold harmless clause', 'Liability assumption', 'Defense obligation'],
+        risk_level='High',
+        citations=['Built-in legal knowledge base']
+    ),
+    'breach': LegalExplanation(
+        term='breach',
+        plain_english='Breaking the terms of a contract by not doing what you promised to do.',
+        legal_definition='The failure of a party to perform any duty or obligation specified in a contract.',
+        real_world_impact='Can lead to lawsuits, financial penalties, and contract termination.',
+        alternatives=['Default', 'Violation', 'Non-performance'],
+        risk_level='High',
+        citations=['Built-in legal knowledge base']
+    ),
+    'termination': LegalExplanation(
+        term='termination',
+        plain_english='Ending a contract before its natural expiration date.',
+        legal_definition='The legal ending of a contract by agreement, breach, or operation of law.',
+        real_world_impact='Ends all future obligations but may trigger penalties or require final settlements.',
+        alternatives=['Cancellation', 'Dissolution', 'Expiration'],
+        risk_level='Medium',
+        citations=['Built-in legal knowledge base']
+    ),
+    'warranty': LegalExplanation(
+        term='warranty',
+        plain_english='A promise that certain facts about a product or service are true.',
+        legal_definition='A contractual assurance that certain conditions or facts are or will remain true.',
+        real_world_impact='Creates liability if the promised conditions turn out to be false.',
+        alternatives=['Guarantee', 'Representation', 'Assurance'],
+        risk_level='Medium',
+        citations=['Built-in legal knowledge base']
+    ),
+    'jurisdiction': LegalExplanation(
+        term='jurisdiction',
+        plain_english='Which court system has the authority to resolve disputes about this contract.',
+        legal_definition='The legal authority of a court to hear and decide a case or controversy.',
+        real_world_impact='Determines where you must go to court and which laws will apply.',
+        alternatives=['Venue clause', 'Forum selection', 'Governing law'],
+        risk_level='Low',
+        citations=['Built-in legal knowledge base']
+    ),
+    'arbitration': LegalExplanation(
+        term='arbitration',
+        plain_english='Resolving disputes through a private judge instead of going to court.',
+        legal_definition='A method of dispute resolution where parties agree to submit their case to a neutral arbitrator.',
+        real_world_impact='Usually faster and more private than court, but limits appeal options.',
+        alternatives=['Mediation', 'Alternative dispute resolution', 'Binding arbitration'],
+        risk_level='Medium',
+        citations=['Built-in legal knowledge base']
+    )
+}
+
 class ContextualExplainer:
     """
     Advanced Legal Document Explanation Engine using Google Cloud RAG
@@ -685,76 +761,13 @@ Focus on practical implications and make the explanation accessible to non-lawye
         """Basic legal knowledge fallback for common terms"""
         term_lower = term.lower().strip()
         
-        # Common legal terms with basic explanations
-        basic_knowledge = {
-            'force majeure': {
-                'plain_english': 'Unforeseeable circumstances that prevent a party from fulfilling a contract, like natural disasters or wars.',
-                'legal_definition': 'A clause that frees parties from liability when extraordinary circumstances beyond their control prevent them from fulfilling their obligations.',
-                'real_world_impact': 'Allows parties to suspend or terminate contracts during major disruptions without penalty.',
-                'alternatives': ['Act of God clause', 'Impossibility clause', 'Frustration of purpose'],
-                'risk_level': 'Medium'
-            },
-            'liquidated damages': {
-                'plain_english': 'A predetermined amount of money that must be paid if someone breaks the contract.',
-                'legal_definition': 'A contractual provision that establishes a specific monetary penalty for breach, agreed upon in advance.',
-                'real_world_impact': 'Provides certainty about consequences and avoids lengthy disputes over actual damages.',
-                'alternatives': ['Penalty clause', 'Stipulated damages', 'Pre-estimated damages'],
-                'risk_level': 'High'
-            },
-            'indemnification': {
-                'plain_english': 'A promise to cover someone else\'s losses and legal costs if they get in trouble because of you.',
-                'legal_definition': 'A contractual obligation where one party agrees to compensate another for harm, loss, or damage.',
-                'real_world_impact': 'Shifts financial risk and legal responsibility from one party to another.',
-                'alternatives': ['Hold harmless clause', 'Liability assumption', 'Defense obligation'],
-                'risk_level': 'High'
-            },
-            'breach': {
-                'plain_english': 'Breaking the terms of a contract by not doing what you promised to do.',
-                'legal_definition': 'The failure of a party to perform any duty or obligation specified in a contract.',
-                'real_world_impact': 'Can lead to lawsuits, financial penalties, and contract termination.',
-                'alternatives': ['Default', 'Violation', 'Non-performance'],
-                'risk_level': 'High'
-            },
-            'termination': {
-                'plain_english': 'Ending a contract before its natural expiration date.',
-                'legal_definition': 'The legal ending of a contract by agreement, breach, or operation of law.',
-                'real_world_impact': 'Ends all future obligations but may trigger penalties or require final settlements.',
-                'alternatives': ['Cancellation', 'Dissolution', 'Expiration'],
-                'risk_level': 'Medium'
-            },
-            'warranty': {
-                'plain_english': 'A promise that certain facts about a product or service are true.',
-                'legal_definition': 'A contractual assurance that certain conditions or facts are or will remain true.',
-                'real_world_impact': 'Creates liability if the promised conditions turn out to be false.',
-                'alternatives': ['Guarantee', 'Representation', 'Assurance'],
-                'risk_level': 'Medium'
-            },
-            'jurisdiction': {
-                'plain_english': 'Which court system has the authority to resolve disputes about this contract.',
-                'legal_definition': 'The legal authority of a court to hear and decide a case or controversy.',
-                'real_world_impact': 'Determines where you must go to court and which laws will apply.',
-                'alternatives': ['Venue clause', 'Forum selection', 'Governing law'],
-                'risk_level': 'Low'
-            },
-            'arbitration': {
-                'plain_english': 'Resolving disputes through a private judge instead of going to court.',
-                'legal_definition': 'A method of dispute resolution where parties agree to submit their case to a neutral arbitrator.',
-                'real_world_impact': 'Usually faster and more private than court, but limits appeal options.',
-                'alternatives': ['Mediation', 'Alternative dispute resolution', 'Binding arbitration'],
-                'risk_level': 'Medium'
-            }
-        }
-        
-        if term_lower in basic_knowledge:
-            info = basic_knowledge[term_lower]
-            return LegalExplanation(
+        hit = _BASIC_KNOWLEDGE.get(term_lower)
+        if hit is not None:
+            return replace(
+                hit,
                 term=term,
-                plain_english=info['plain_english'],
-                legal_definition=info['legal_definition'],
-                real_world_impact=info['real_world_impact'],
-                alternatives=info['alternatives'],
-                risk_level=info['risk_level'],
-                citations=['Built-in legal knowledge base']
+                alternatives=list(hit.alternatives),
+                citations=list(hit.citations)
             )
         else:
             # Ultimate fallback for unknown terms
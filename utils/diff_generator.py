@@ -1,224 +1,595 @@
 import difflib
 import html
-from typing import Dict, List, Any
+import inspect
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from hashlib import blake2b
+from typing import Dict, Iterator, List, Any, Tuple
+
+try:
+    from diff_match_patch import diff_match_patch
+    DMP_AVAILABLE = True
+except ImportError:
+    DMP_AVAILABLE = False
+
+try:
+    from rapidfuzz.distance import Indel
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+_DIFF_STYLES = """
+<style>
+.diff-container {
+    font-family: 'Courier New', monospace;
+    font-size: 12px;
+    line-height: 1.4;
+    border: 1px solid #ddd;
+    border-radius: 5px;
+    overflow: hidden;
+}
+.diff-header {
+    background-color: #f8f9fa;
+    padding: 10px;
+    border-bottom: 1px solid #ddd;
+    font-weight: bold;
+}
+.diff-content {
+    max-height: 400px;
+    overflow-y: auto;
+}
+table.diff {
+    width: 100%;
+    border-collapse: collapse;
+    font-family: 'Courier New', monospace;
+    font-size: 12px;
+}
+.diff td {
+    padding: 2px 8px;
+    vertical-align: top;
+    white-space: pre-wrap;
+    word-break: break-word;
+}
+.diff_header {
+    background-color: #e9ecef;
+    font-weight: bold;
+    text-align: center;
+    padding: 8px;
+}
+.diff_next {
+    background-color: #007bff;
+    color: white;
+    text-align: center;
+    padding: 4px;
+    font-size: 10px;
+}
+.diff_add {
+    background-color: #d4edda;
+    border-left: 3px solid #28a745;
+}
+.diff_chg {
+    background-color: #fff3cd;
+    border-left: 3px solid #ffc107;
+}
+.diff_sub {
+    background-color: #f8d7da;
+    border-left: 3px solid #dc3545;
+}
+.diff_context {
+    background-color: #f8f9fa;
+}
+.line-number {
+    background-color: #e9ecef;
+    color: #6c757d;
+    text-align: right;
+    padding-right: 8px;
+    border-right: 1px solid #ddd;
+    user-select: none;
+    width: 40px;
+}
+.inline-diff {
+    font-family: Arial, sans-serif;
+    line-height: 1.6;
+    padding: 15px;
+    border: 1px solid #ddd;
+    border-radius: 5px;
+    background-color: #f8f9fa;
+}
+.diff-insert {
+    background-color: #d4edda;
+    color: #155724;
+}
+.diff-delete {
+    background-color: #f8d7da;
+    color: #721c24;
+    text-decoration: line-through;
+}
+</style>
+"""
+
+_HTML_DIFF_PREFIX = """
+<div class="diff-container">
+    <div class="diff-header">
+        📊 Side-by-Side Comparison
+    </div>
+    <div class="diff-content">
+"""
+
+_HTML_DIFF_SUFFIX = """
+    </div>
+</div>
+"""
+
+# Inline diff markup is class-only; the .inline-diff/.diff-insert/.diff-delete rules
+# live in _DIFF_STYLES and in the export report stylesheet that embeds these fragments
+_INLINE_WRAPPER_OPEN = '<div class="inline-diff">'
+_INLINE_WRAPPER_CLOSE = '</div>'
+_INSERT_OPEN = '<span class="diff-insert">'
+_DELETE_OPEN = '<span class="diff-delete">'
+_SPAN_CLOSE = '</span>'
+
+# Canned output for identical inputs, where there is nothing to diff
+_NO_CHANGES_HTML = """
+<table class="diff">
+    <tr><td class="diff_header">No changes - the rewritten clause is identical to the original</td></tr>
+</table>
+"""
+
+# Shown when no line differs but the texts do (line endings only), so the
+# table never claims the clauses are identical
+_NO_LINE_CHANGES_HTML = """
+<table class="diff">
+    <tr><td class="diff_header">No line-level changes - the clauses differ only in line breaks</td></tr>
+</table>
+"""
+
+# Cell classes per opcode for the side-by-side table: (original side, rewritten side)
+_ROW_CLASSES = {
+    'equal': ('diff_context', 'diff_context'),
+    'delete': ('diff_sub', 'diff_context'),
+    'insert': ('diff_context', 'diff_add'),
+    'replace': ('diff_chg', 'diff_chg')
+}
+
+# Structured-diff handling per change opcode: (block type, stats counter, whether
+# the block's start line is numbered on the rewritten side)
+_CHANGE_BLOCKS = {
+    'delete': ('deletion', 'deletions', False),
+    'insert': ('addition', 'additions', True),
+    'replace': ('modification', 'modifications', False)
+}
+
+_TABLE_HEAD = (
+    '<table class="diff">\n'
+    '<thead><tr><th class="diff_header" colspan="2">Original Clause</th>'
+    '<th class="diff_header" colspan="2">Rewritten Clause</th></tr></thead>\n'
+    '<tbody>\n'
+)
+_TABLE_TAIL = '</tbody>\n</table>'
+_GROUP_SEPARATOR = '<tr><td class="diff_next" colspan="4">&#8943;</td></tr>\n'
+
+# Above this combined input size the structured diff skips the server-side HTML table
+# and leaves rendering to the client, which already receives the per-line data
+_CLIENT_RENDER_THRESHOLD = 50_000
+
+# Maximum number of memoized diff results kept per DiffGenerator
+_DIFF_CACHE_SIZE = 128
+
+
+# Sentence boundary: whitespace following terminal punctuation. Unlike split('.'),
+# this keeps decimals such as "1.5%" inside a single sentence.
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Character-level diffs escape many tiny, repeated segments (spaces, common words).
+# Only short segments are cached so no clause text is kept alive by the cache.
+_ESCAPE_CACHE_MAX_LEN = 64
+_escape_short = lru_cache(maxsize=4096)(html.escape)
+
+
+def _escape(text: str) -> str:
+    """html.escape, memoized for short segments only"""
+    if len(text) <= _ESCAPE_CACHE_MAX_LEN:
+        return _escape_short(text)
+    return html.escape(text)
+
+# Runs of spaces and tabs, collapsed before line matching
+_WHITESPACE_RUN_RE = re.compile(r'[ \t]+')
+
+
+def _normalize(line: str) -> str:
+    """Collapse whitespace runs and trailing spaces so layout-only edits compare equal"""
+    return _WHITESPACE_RUN_RE.sub(' ', line).rstrip()
+
+
+def _split_sentences(text: str) -> List[str]:
+    """Split text into non-empty sentences"""
+    return [s for s in _SENTENCE_SPLIT_RE.split(text.strip()) if s]
+
+
+def _split_equal_blocks(opcodes: list, original_lines: List[str], rewritten_lines: List[str]) -> list:
+    """Turn lines matched only after normalization into 'replace' opcodes.
+    
+    Normalized matching aligns lines whose layout changed, but such lines are still
+    edits and must be reported as changed, not as context.
+    """
+    result = []
+    for opcode in opcodes:
+        tag, i1, i2, j1, j2 = opcode
+        if tag != 'equal':
+            result.append(opcode)
+            continue
+        
+        # Emit alternating runs of raw-identical and raw-different line pairs
+        offset = j1 - i1
+        run_start = i1
+        run_same = True
+        for i in range(i1, i2):
+            same = original_lines[i] == rewritten_lines[i + offset]
+            if same != run_same and i > run_start:
+                result.append(('equal' if run_same else 'replace', run_start, i, run_start + offset, i + offset))
+                run_start = i
+            run_same = same
+        if i2 > run_start:
+            result.append(('equal' if run_same else 'replace', run_start, i2, run_start + offset, i2 + offset))
+    return result
+
+
+def _group_opcodes(opcodes: list, n: int) -> List[list]:
+    """Group opcodes into change clusters with up to n lines of context.
+    
+    Same algorithm as SequenceMatcher.get_grouped_opcodes, but works on an
+    already computed (and possibly cached) opcode list without mutating it.
+    """
+    codes = list(opcodes) or [('equal', 0, 1, 0, 1)]
+    
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    
+    groups = []
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        # Start a new group whenever there is a large range with no changes
+        if tag == 'equal' and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        groups.append(group)
+    
+    return groups
+
+
+def _copy_result(value):
+    """Copy the dicts, lists and tuples of a diff result; strings and numbers are shared.
+    
+    Diff results are plain JSON-shaped data, so this is much cheaper than copy.deepcopy,
+    which pays for memo bookkeeping and per-type dispatch on every leaf.
+    """
+    if isinstance(value, dict):
+        return {k: _copy_result(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_result(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy_result(v) for v in value)
+    return value
+
+
+def _memoize_diff(method):
+    """Cache a diff method's result keyed on content hashes of its two text inputs.
+    
+    Callers always receive their own copy of dict and list results, so mutating one
+    (as the export manager does) cannot corrupt the cached value.
+    """
+    signature = inspect.signature(method)
+    
+    @wraps(method)
+    def wrapper(self, original: str, rewritten: str, *args, **kwargs):
+        # Bind with defaults so f(a, b) and f(a, b, context_lines=3) share one entry
+        bound = signature.bind(self, original, rewritten, *args, **kwargs)
+        bound.apply_defaults()
+        key = (
+            method.__name__,
+            blake2b(original.encode(), digest_size=16).digest(),
+            blake2b(rewritten.encode(), digest_size=16).digest(),
+            tuple(bound.arguments.items())[3:]
+        )
+        
+        with self._cache_lock:
+            result = self._diff_cache.get(key)
+            if result is not None:
+                self._diff_cache.move_to_end(key)
+        
+        if result is None:
+            result = method(self, original, rewritten, *args, **kwargs)
+            with self._cache_lock:
+                self._diff_cache[key] = result
+                if len(self._diff_cache) > _DIFF_CACHE_SIZE:
+                    self._diff_cache.popitem(last=False)
+        
+        # Strings are immutable and returned as is
+        return result if isinstance(result, str) else _copy_result(result)
+    
+    return wrapper
+
 
 class DiffGenerator:
     """Generates HTML diffs between original and rewritten text"""
     
     def __init__(self):
-        self.diff_styles = """
-        <style>
-        .diff-container {
-            font-family: 'Courier New', monospace;
-            font-size: 12px;
-            line-height: 1.4;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-            overflow: hidden;
-        }
-        .diff-header {
-            background-color: #f8f9fa;
-            padding: 10px;
-            border-bottom: 1px solid #ddd;
-            font-weight: bold;
-        }
-        .diff-content {
-            max-height: 400px;
-            overflow-y: auto;
-        }
-        table.diff {
-            width: 100%;
-            border-collapse: collapse;
-            font-family: 'Courier New', monospace;
-            font-size: 12px;
-        }
-        .diff td {
-            padding: 2px 8px;
-            vertical-align: top;
-            white-space: pre-wrap;
-            word-break: break-word;
-        }
-        .diff_header {
-            background-color: #e9ecef;
-            font-weight: bold;
-            text-align: center;
-            padding: 8px;
-        }
-        .diff_next {
-            background-color: #007bff;
-            color: white;
-            text-align: center;
-            padding: 4px;
-            font-size: 10px;
-        }
-        .diff_add {
-            background-color: #d4edda;
-            border-left: 3px solid #28a745;
-        }
-        .diff_chg {
-            background-color: #fff3cd;
-            border-left: 3px solid #ffc107;
-        }
-        .diff_sub {
-            background-color: #f8d7da;
-            border-left: 3px solid #dc3545;
-        }
-        .diff_context {
-            background-color: #f8f9fa;
-        }
-        .line-number {
-            background-color: #e9ecef;
-            color: #6c757d;
-            text-align: right;
-            padding-right: 8px;
-            border-right: 1px solid #ddd;
-            user-select: none;
-            width: 40px;
-        }
-        </style>
-        """
+        self.diff_styles = _DIFF_STYLES
+        
+        # LRU of recent results; the same clause pair is re-diffed on every UI refresh
+        self._diff_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
     
+    @_memoize_diff
     def generate_html_diff(self, original: str, rewritten: str, context_lines: int = 3) -> str:
         """Generate an HTML diff between original and rewritten text"""
         
-        # Split text into lines for better diff visualization
-        original_lines = original.splitlines(keepends=True)
-        rewritten_lines = rewritten.splitlines(keepends=True)
-        
-        # Create the diff
-        differ = difflib.HtmlDiff(
-            wrapcolumn=80,
-            linejunk=difflib.IS_LINE_JUNK,
-            charjunk=difflib.IS_CHARACTER_JUNK
-        )
+        if original == rewritten:
+            return "".join((self.diff_styles, _HTML_DIFF_PREFIX, _NO_CHANGES_HTML, _HTML_DIFF_SUFFIX))
         
-        diff_html = differ.make_table(
-            original_lines,
-            rewritten_lines,
-            fromdesc="Original Clause",
-            todesc="Rewritten Clause",
-            context=True,
-            numlines=context_lines
+        stream = self.generate_opcode_stream(original, rewritten)
+        diff_html = self._render_html_table(
+            stream['original_lines'],
+            stream['rewritten_lines'],
+            stream['opcodes'],
+            context_lines
         )
         
         # Wrap with custom styling and container
-        full_html = f"""
-        {self.diff_styles}
-        <div class="diff-container">
-            <div class="diff-header">
-                📊 Side-by-Side Comparison
-            </div>
-            <div class="diff-content">
-                {diff_html}
-            </div>
-        </div>
-        """
-        
-        return full_html
+        return "".join((self.diff_styles, _HTML_DIFF_PREFIX, diff_html, _HTML_DIFF_SUFFIX))
     
-    def generate_unified_diff(self, original: str, rewritten: str, context_lines: int = 3) -> str:
-        """Generate a unified diff format"""
+    def _render_html_table(self, original_lines: List[str], rewritten_lines: List[str],
+                           opcodes: list, context_lines: int) -> str:
+        """Render a side-by-side diff table directly from line-level opcodes"""
+        
+        groups = _group_opcodes(opcodes, context_lines)
+        if not groups:
+            return _NO_LINE_CHANGES_HTML
+        
+        escape = html.escape
+        parts = [_TABLE_HEAD]
+        append = parts.append
+        
+        for index, group in enumerate(groups):
+            if index:
+                append(_GROUP_SEPARATOR)
+            
+            for opcode, a1, a2, b1, b2 in group:
+                left_class, right_class = _ROW_CLASSES[opcode]
+                
+                # Pair lines up side by side; the shorter side is padded with empty cells
+                for k in range(max(a2 - a1, b2 - b1)):
+                    i = a1 + k
+                    j = b1 + k
+                    
+                    append('<tr>')
+                    if i < a2:
+                        append(f'<td class="line-number">{i + 1}</td><td class="{left_class}">{escape(original_lines[i])}</td>')
+                    else:
+                        append('<td class="line-number"></td><td></td>')
+                    if j < b2:
+                        append(f'<td class="line-number">{j + 1}</td><td class="{right_class}">{escape(rewritten_lines[j])}</td>')
+                    else:
+                        append('<td class="line-number"></td><td></td>')
+                    append('</tr>\n')
+        
+        append(_TABLE_TAIL)
+        return "".join(parts)
+    
+    def generate_unified_diff(self, original: str, rewritten: str, context_lines: int = 3) -> Iterator[str]:
+        """Stream a unified diff one chunk at a time"""
+        
+        if original == rewritten:
+            return
         
         original_lines = original.splitlines(keepends=True)
         rewritten_lines = rewritten.splitlines(keepends=True)
         
-        diff = difflib.unified_diff(
+        yield from difflib.unified_diff(
             original_lines,
             rewritten_lines,
             fromfile='original_clause.txt',
             tofile='rewritten_clause.txt',
             n=context_lines
         )
-        
-        return ''.join(diff)
     
+    @_memoize_diff
+    def generate_unified_diff_string(self, original: str, rewritten: str, context_lines: int = 3) -> str:
+        """Generate a unified diff format as a single string"""
+        return ''.join(self.generate_unified_diff(original, rewritten, context_lines))
+    
+    @_memoize_diff
     def generate_inline_diff(self, original: str, rewritten: str) -> str:
         """Generate inline diff with highlighting"""
         
-        # Use SequenceMatcher for character-level differences
-        matcher = difflib.SequenceMatcher(None, original, rewritten)
+        if original == rewritten:
+            return _INLINE_WRAPPER_OPEN + html.escape(original) + _INLINE_WRAPPER_CLOSE
         
-        result_html = []
+        result_html = [_INLINE_WRAPPER_OPEN]
+        append = result_html.append
+        escape = _escape
         
-        for opcode, a1, a2, b1, b2 in matcher.get_opcodes():
-            if opcode == 'equal':
-                result_html.append(html.escape(original[a1:a2]))
-            elif opcode == 'insert':
-                result_html.append(f'<span class="diff-insert" style="background-color: #d4edda; color: #155724;">{html.escape(rewritten[b1:b2])}</span>')
-            elif opcode == 'delete':
-                result_html.append(f'<span class="diff-delete" style="background-color: #f8d7da; color: #721c24; text-decoration: line-through;">{html.escape(original[a1:a2])}</span>')
-            elif opcode == 'replace':
-                result_html.append(f'<span class="diff-delete" style="background-color: #f8d7da; color: #721c24; text-decoration: line-through;">{html.escape(original[a1:a2])}</span>')
-                result_html.append(f'<span class="diff-insert" style="background-color: #d4edda; color: #155724;">{html.escape(rewritten[b1:b2])}</span>')
+        if DMP_AVAILABLE:
+            # diff-match-patch handles long character-level diffs far better than SequenceMatcher
+            dmp = diff_match_patch()
+            diffs = dmp.diff_main(original, rewritten)
+            dmp.diff_cleanupSemantic(diffs)
+            
+            markup = {
+                dmp.DIFF_EQUAL: ('', ''),
+                dmp.DIFF_INSERT: (_INSERT_OPEN, _SPAN_CLOSE),
+                dmp.DIFF_DELETE: (_DELETE_OPEN, _SPAN_CLOSE)
+            }
+            
+            for op, text in diffs:
+                open_tag, close_tag = markup[op]
+                append(open_tag + escape(text) + close_tag)
+        else:
+            # Fallback: SequenceMatcher for character-level differences
+            matcher = difflib.SequenceMatcher(None, original, rewritten)
+            
+            for opcode, a1, a2, b1, b2 in matcher.get_opcodes():
+                if opcode == 'equal':
+                    append(escape(original[a1:a2]))
+                    continue
+                # delete, insert and replace: removed text (if any) followed by added text (if any)
+                if a2 > a1:
+                    append(_DELETE_OPEN + escape(original[a1:a2]) + _SPAN_CLOSE)
+                if b2 > b1:
+                    append(_INSERT_OPEN + escape(rewritten[b1:b2]) + _SPAN_CLOSE)
         
-        return f'<div style="font-family: Arial, sans-serif; line-height: 1.6; padding: 15px; border: 1px solid #ddd; border-radius: 5px; background-color: #f8f9fa;">{"".join(result_html)}</div>'
+        append(_INLINE_WRAPPER_CLOSE)
+        return "".join(result_html)
+    
+    def generate_all(self, original: str, rewritten: str) -> Dict[str, Any]:
+        """Generate the HTML, inline, summary and highlight views of one clause pair concurrently"""
+        
+        # Compute the shared line opcodes up front so the workers hit the cache
+        self.generate_opcode_stream(original, rewritten)
+        
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            html_future = executor.submit(self.generate_html_diff, original, rewritten)
+            inline_future = executor.submit(self.generate_inline_diff, original, rewritten)
+            summary_future = executor.submit(self.generate_summary_and_highlights, original, rewritten)
+            
+            summary, highlights = summary_future.result()
+            return {
+                'html_diff': html_future.result(),
+                'inline_diff': inline_future.result(),
+                'summary': summary,
+                'highlights': highlights
+            }
     
     def generate_summary_diff(self, original: str, rewritten: str) -> Dict[str, Any]:
         """Generate a summary of changes made"""
+        return self.generate_summary_and_highlights(original, rewritten)[0]
+    
+    def generate_change_highlights(self, original: str, rewritten: str) -> Dict[str, List[str]]:
+        """Extract specific types of changes"""
+        return self.generate_summary_and_highlights(original, rewritten)[1]
+    
+    @_memoize_diff
+    def generate_summary_and_highlights(self, original: str, rewritten: str) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+        """Generate the word-level change summary and sentence-level highlights in one call"""
         
         original_words = original.split()
         rewritten_words = rewritten.split()
         
+        highlights = {
+            'added_phrases': [],
+            'removed_phrases': [],
+            'modified_phrases': []
+        }
+        
+        if original == rewritten:
+            summary = {
+                'additions': 0,
+                'deletions': 0,
+                'modifications': 0,
+                'unchanged': len(original_words),
+                'similarity_ratio': 1.0,
+                'word_count_change': 0,
+                'percent_changed': 0.0 if original_words else 0
+            }
+            return summary, highlights
+        
+        # Word-level summary
         matcher = difflib.SequenceMatcher(None, original_words, rewritten_words)
         
-        changes = {
+        if RAPIDFUZZ_AVAILABLE:
+            # C++ LCS-based score; the matcher is still used for the change counts below
+            similarity = Indel.normalized_similarity(original_words, rewritten_words)
+        else:
+            similarity = matcher.ratio()
+        
+        summary = {
             'additions': 0,
             'deletions': 0,
             'modifications': 0,
             'unchanged': 0,
-            'similarity_ratio': matcher.ratio(),
+            'similarity_ratio': similarity,
             'word_count_change': len(rewritten_words) - len(original_words)
         }
         
         for opcode, a1, a2, b1, b2 in matcher.get_opcodes():
             if opcode == 'equal':
-                changes['unchanged'] += (a2 - a1)
+                summary['unchanged'] += (a2 - a1)
             elif opcode == 'insert':
-                changes['additions'] += (b2 - b1)
+                summary['additions'] += (b2 - b1)
             elif opcode == 'delete':
-                changes['deletions'] += (a2 - a1)
+                summary['deletions'] += (a2 - a1)
             elif opcode == 'replace':
-                changes['modifications'] += max((a2 - a1), (b2 - b1))
+                summary['modifications'] += max((a2 - a1), (b2 - b1))
         
         # Calculate percentages
         total_original_words = len(original_words)
         if total_original_words > 0:
-            changes['percent_changed'] = round(
-                ((changes['additions'] + changes['deletions'] + changes['modifications']) 
+            summary['percent_changed'] = round(
+                ((summary['additions'] + summary['deletions'] + summary['modifications']) 
                  / total_original_words) * 100, 2
             )
         else:
-            changes['percent_changed'] = 0
+            summary['percent_changed'] = 0
         
-        return changes
-    
-    def generate_change_highlights(self, original: str, rewritten: str) -> Dict[str, List[str]]:
-        """Extract specific types of changes"""
-        
-        changes = {
-            'added_phrases': [],
-            'removed_phrases': [],
-            'modified_phrases': []
-        }
-        
-        # Split into sentences for better phrase detection
-        original_sentences = [s.strip() for s in original.split('.') if s.strip()]
-        rewritten_sentences = [s.strip() for s in rewritten.split('.') if s.strip()]
+        # Sentence-level highlights for better phrase detection
+        original_sentences = _split_sentences(original)
+        rewritten_sentences = _split_sentences(rewritten)
         
         matcher = difflib.SequenceMatcher(None, original_sentences, rewritten_sentences)
         
         for opcode, a1, a2, b1, b2 in matcher.get_opcodes():
             if opcode == 'insert':
-                changes['added_phrases'].extend(rewritten_sentences[b1:b2])
+                highlights['added_phrases'].extend(rewritten_sentences[b1:b2])
             elif opcode == 'delete':
-                changes['removed_phrases'].extend(original_sentences[a1:a2])
+                highlights['removed_phrases'].extend(original_sentences[a1:a2])
             elif opcode == 'replace':
-                changes['modified_phrases'].extend([
+                highlights['modified_phrases'].append(
                     f"Changed from: '{' '.join(original_sentences[a1:a2])}' to: '{' '.join(rewritten_sentences[b1:b2])}'"
-                ])
+                )
         
-        return changes
+        return summary, highlights
     
+    @_memoize_diff
+    def generate_opcode_stream(self, original: str, rewritten: str) -> Dict[str, Any]:
+        """Generate line-level opcodes so large diffs can be rendered by the client"""
+        
+        original_lines = original.splitlines()
+        rewritten_lines = rewritten.splitlines()
+        
+        if original == rewritten:
+            # Identical inputs: every line is context, no need to run the matcher
+            opcodes = [('equal', 0, len(original_lines), 0, len(rewritten_lines))] if original_lines else []
+        else:
+            # Align on whitespace-normalized lines; indices still refer to the raw lines,
+            # and lines that only match once normalized are reported as replacements
+            opcodes = _split_equal_blocks(
+                difflib.SequenceMatcher(
+                    None,
+                    [_normalize(line) for line in original_lines],
+                    [_normalize(line) for line in rewritten_lines]
+                ).get_opcodes(),
+                original_lines,
+                rewritten_lines
+            )
+        
+        return {
+            'original_lines': original_lines,
+            'rewritten_lines': rewritten_lines,
+            'opcodes': opcodes
+        }
+    
+    @_memoize_diff
     def generate_structured_diff(self, original: str, rewritten: str) -> Dict[str, Any]:
         """Generate structured diff data for frontend display"""
         
@@ -226,8 +597,8 @@ class DiffGenerator:
         original_lines = original.splitlines()
         rewritten_lines = rewritten.splitlines()
         
-        # Create sequence matcher
-        matcher = difflib.SequenceMatcher(None, original_lines, rewritten_lines)
+        opcodes = self.generate_opcode_stream(original, rewritten)['opcodes']
+        client_render = len(original) + len(rewritten) > _CLIENT_RENDER_THRESHOLD
         
         # Initialize results structure
         result = {
@@ -241,157 +612,88 @@ class DiffGenerator:
                 'modifications': 0,
                 'total_changes': 0
             },
-            'html_diff': self.generate_html_diff(original, rewritten)
+            'html_diff': None if client_render else self.generate_html_diff(original, rewritten),
+            'client_render': client_render
         }
         
         original_line_num = 1
         modified_line_num = 1
         
-        for opcode, a1, a2, b1, b2 in matcher.get_opcodes():
+        original_out = result['original_lines']
+        modified_out = result['modified_lines']
+        unified_out = result['unified_diff']
+        stats = result['stats']
+        
+        for opcode, a1, a2, b1, b2 in opcodes:
             if opcode == 'equal':
                 # Context lines - same in both
-                for i in range(a1, a2):
-                    original_content = original_lines[i] if i < len(original_lines) else ''
-                    result['original_lines'].append({
-                        'line_number': original_line_num,
-                        'content': original_content,
-                        'type': 'context'
-                    })
-                    original_line_num += 1
-                
-                for i in range(b1, b2):
-                    modified_content = rewritten_lines[i] if i < len(rewritten_lines) else ''
-                    result['modified_lines'].append({
-                        'line_number': modified_line_num,
-                        'content': modified_content,
-                        'type': 'context'
-                    })
-                    modified_line_num += 1
-                    
-                    # Add to unified diff too
-                    result['unified_diff'].append({
-                        'old_line_number': original_line_num - 1,
-                        'new_line_number': modified_line_num - 1,
-                        'content': modified_content,
+                original_out.extend([
+                    {'line_number': n, 'content': original_lines[i], 'type': 'context'}
+                    for n, i in enumerate(range(a1, a2), start=original_line_num)
+                ])
+                modified_out.extend([
+                    {'line_number': n, 'content': rewritten_lines[i], 'type': 'context'}
+                    for n, i in enumerate(range(b1, b2), start=modified_line_num)
+                ])
+                unified_out.extend([
+                    {
+                        'old_line_number': original_line_num + k,
+                        'new_line_number': modified_line_num + k,
+                        'content': rewritten_lines[b1 + k],
                         'type': 'context',
                         'prefix': ' '
-                    })
+                    }
+                    for k in range(b2 - b1)
+                ])
+                original_line_num += a2 - a1
+                modified_line_num += b2 - b1
+                continue
             
-            elif opcode == 'delete':
-                # Lines removed from original
-                change_block = {
-                    'type': 'deletion',
-                    'original_lines': [],
-                    'modified_lines': [],
-                    'start_line': original_line_num
-                }
-                
-                for i in range(a1, a2):
-                    original_content = original_lines[i] if i < len(original_lines) else ''
-                    result['original_lines'].append({
-                        'line_number': original_line_num,
-                        'content': original_content,
-                        'type': 'removed'
-                    })
-                    change_block['original_lines'].append(original_content)
-                    
-                    # Add to unified diff
-                    result['unified_diff'].append({
-                        'old_line_number': original_line_num,
-                        'new_line_number': None,
-                        'content': original_content,
-                        'type': 'removed',
-                        'prefix': '-'
-                    })
-                    
-                    original_line_num += 1
-                    result['stats']['deletions'] += 1
-                
-                result['change_blocks'].append(change_block)
+            removed = original_lines[a1:a2]
+            added = rewritten_lines[b1:b2]
             
-            elif opcode == 'insert':
-                # Lines added to rewritten
-                change_block = {
-                    'type': 'addition',
-                    'original_lines': [],
-                    'modified_lines': [],
-                    'start_line': modified_line_num
-                }
-                
-                for i in range(b1, b2):
-                    modified_content = rewritten_lines[i] if i < len(rewritten_lines) else ''
-                    result['modified_lines'].append({
-                        'line_number': modified_line_num,
-                        'content': modified_content,
-                        'type': 'added'
-                    })
-                    change_block['modified_lines'].append(modified_content)
-                    
-                    # Add to unified diff
-                    result['unified_diff'].append({
-                        'old_line_number': None,
-                        'new_line_number': modified_line_num,
-                        'content': modified_content,
-                        'type': 'added',
-                        'prefix': '+'
-                    })
-                    
-                    modified_line_num += 1
-                    result['stats']['additions'] += 1
-                
-                result['change_blocks'].append(change_block)
+            # One side is empty for deletions and insertions, so the larger side is the changed line count
+            block_type, counter, starts_in_rewritten = _CHANGE_BLOCKS[opcode]
+            start_line = modified_line_num if starts_in_rewritten else original_line_num
+            stats[counter] += max(a2 - a1, b2 - b1)
             
-            elif opcode == 'replace':
-                # Lines changed
-                change_block = {
-                    'type': 'modification',
-                    'original_lines': [],
-                    'modified_lines': [],
-                    'start_line': original_line_num
+            original_out.extend([
+                {'line_number': n, 'content': content, 'type': 'removed'}
+                for n, content in enumerate(removed, start=original_line_num)
+            ])
+            unified_out.extend([
+                {
+                    'old_line_number': n,
+                    'new_line_number': None,
+                    'content': content,
+                    'type': 'removed',
+                    'prefix': '-'
                 }
-                
-                # Process removed lines
-                for i in range(a1, a2):
-                    original_content = original_lines[i] if i < len(original_lines) else ''
-                    result['original_lines'].append({
-                        'line_number': original_line_num,
-                        'content': original_content,
-                        'type': 'removed'
-                    })
-                    change_block['original_lines'].append(original_content)
-                    
-                    result['unified_diff'].append({
-                        'old_line_number': original_line_num,
-                        'new_line_number': None,
-                        'content': original_content,
-                        'type': 'removed',
-                        'prefix': '-'
-                    })
-                    
-                    original_line_num += 1
-                
-                # Process added lines
-                for i in range(b1, b2):
-                    modified_content = rewritten_lines[i] if i < len(rewritten_lines) else ''
-                    result['modified_lines'].append({
-                        'line_number': modified_line_num,
-                        'content': modified_content,
-                        'type': 'added'
-                    })
-                    change_block['modified_lines'].append(modified_content)
-                    
-                    result['unified_diff'].append({
-                        'old_line_number': None,
-                        'new_line_number': modified_line_num,
-                        'content': modified_content,
-                        'type': 'added',
-                        'prefix': '+'
-                    })
-                    
-                    modified_line_num += 1
-                
-                result['stats']['modifications'] += max(a2 - a1, b2 - b1)
-                result['change_blocks'].append(change_block)
+                for n, content in enumerate(removed, start=original_line_num)
+            ])
+            modified_out.extend([
+                {'line_number': n, 'content': content, 'type': 'added'}
+                for n, content in enumerate(added, start=modified_line_num)
+            ])
+            unified_out.extend([
+                {
+                    'old_line_number': None,
+                    'new_line_number': n,
+                    'content': content,
+                    'type': 'added',
+                    'prefix': '+'
+                }
+                for n, content in enumerate(added, start=modified_line_num)
+            ])
+            original_line_num += a2 - a1
+            modified_line_num += b2 - b1
+            
+            result['change_blocks'].append({
+                'type': block_type,
+                'original_lines': list(removed),
+                'modified_lines': list(added),
+                'start_line': start_line
+            })
         
         # Calculate total changes
         result['stats']['total_changes'] = (
@@ -1,9 +1,405 @@
-import html
 import base64
+import logging
+import re
+import sys
+from bisect import bisect_right
+from collections import Counter
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from typing import IO, Dict, Iterator, List, Any, NamedTuple, Optional, Union
 from .diff_generator import DiffGenerator
 
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Report stylesheet, kept readable here and minified once at import
+_REPORT_CSS = """
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    line-height: 1.6;
+    color: #333;
+    max-width: 1200px;
+    margin: 0 auto;
+    padding: 20px;
+    background-color: #f8f9fa;
+}
+.header {
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    padding: 30px;
+    border-radius: 10px;
+    text-align: center;
+    margin-bottom: 30px;
+}
+.header h1 {
+    margin: 0;
+    font-size: 2.5em;
+}
+.header p {
+    margin: 10px 0 0;
+    opacity: 0.9;
+}
+.section {
+    background: white;
+    padding: 25px;
+    border-radius: 10px;
+    margin-bottom: 25px;
+    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+}
+.section h2 {
+    color: #2c3e50;
+    border-bottom: 3px solid #3498db;
+    padding-bottom: 10px;
+    margin-top: 0;
+}
+.metrics {
+    display: flex;
+    justify-content: space-around;
+    flex-wrap: wrap;
+    margin: 20px 0;
+}
+.metric {
+    text-align: center;
+    min-width: 150px;
+    margin: 10px;
+}
+.metric .number {
+    font-size: 2.5em;
+    font-weight: bold;
+    color: #3498db;
+}
+.metric .label {
+    color: #7f8c8d;
+    font-size: 0.9em;
+}
+.risk-high { border-left: 5px solid #e74c3c; }
+.risk-medium { border-left: 5px solid #f39c12; }
+.risk-low { border-left: 5px solid #27ae60; }
+.clause-box {
+    background: #f8f9fa;
+    border: 1px solid #dee2e6;
+    border-radius: 5px;
+    padding: 20px;
+    margin: 15px 0;
+}
+.original-text {
+    background: #fff5f5;
+    border-left: 4px solid #e53e3e;
+    padding: 15px;
+    margin: 10px 0;
+    border-radius: 0 5px 5px 0;
+}
+.rewritten-text {
+    background: #f0fff4;
+    border-left: 4px solid #38a169;
+    padding: 15px;
+    margin: 10px 0;
+    border-radius: 0 5px 5px 0;
+}
+.rationale {
+    background: #e6f3ff;
+    border: 1px solid #b3d9ff;
+    padding: 15px;
+    border-radius: 5px;
+    margin: 10px 0;
+}
+.inline-diff {
+    font-family: Arial, sans-serif;
+    line-height: 1.6;
+    padding: 15px;
+    border: 1px solid #ddd;
+    border-radius: 5px;
+    background-color: #f8f9fa;
+}
+.diff-insert {
+    background-color: #d4edda;
+    color: #155724;
+}
+.diff-delete {
+    background-color: #f8d7da;
+    color: #721c24;
+    text-decoration: line-through;
+}
+.disclaimer {
+    background: #fff3cd;
+    border: 1px solid #ffeaa7;
+    padding: 20px;
+    border-radius: 10px;
+    margin: 20px 0;
+    text-align: center;
+}
+.footer {
+    text-align: center;
+    color: #7f8c8d;
+    margin-top: 40px;
+    padding-top: 20px;
+    border-top: 1px solid #dee2e6;
+}
+@media (max-width: 768px) {
+    .metrics {
+        flex-direction: column;
+        align-items: center;
+    }
+    .header h1 {
+        font-size: 2em;
+    }
+}
+"""
+
+
+def _minify_css(css: str) -> str:
+    """Strip comments and insignificant whitespace from a stylesheet"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{}:;,])\s*', r'\1', css).strip()
+
+
+# Document head, stylesheet and banner up to the generation timestamp
+_HEADER_PREFIX = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Legal Redline Report</title>
+    <style>""" + _minify_css(_REPORT_CSS) + """</style>
+</head>
+<body>
+    <div class="header">
+        <h1>⚖️ Legal Redline Report</h1>
+        <p>AI-Powered Contract Analysis and Clause Rewriting</p>
+        <p>Generated on: """
+
+# Rest of the banner and the disclaimer
+_HEADER_SUFFIX = """</p>
+    </div>
+    
+    <div class="disclaimer">
+        <strong>⚠️ LEGAL DISCLAIMER:</strong> This report is generated by AI for informational purposes only 
+        and does not constitute legal advice. Always consult with a qualified attorney for legal matters.
+    </div>
+"""
+
+_FOOTER = """
+    <div class="footer">
+        <p>Report generated by Legal Redline Sandbox</p>
+        <p>This AI-powered tool is designed to assist in contract review but does not replace professional legal advice.</p>
+        <p>&copy; 2025 Legal Redline Sandbox. All rights reserved.</p>
+    </div>
+</body>
+</html>
+"""
+
+# Static report scaffolding, written verbatim around the per-clause content
+_RISK_SECTION_EMPTY = """
+<div class="section">
+    <h2>🔍 Risk Analysis</h2>
+    <p>No significant risks detected in the contract.</p>
+</div>
+"""
+
+_RISK_SECTION_OPEN = """
+<div class="section">
+    <h2>🔍 Risk Analysis</h2>
+    
+    <h3>Risk Distribution</h3>
+    <ul>
+"""
+
+_RISK_DETAILS_OPEN = """
+    </ul>
+    
+    <h3>Detailed Risk Assessment</h3>
+"""
+
+_REWRITES_SECTION_EMPTY = """
+<div class="section">
+    <h2>✏️ Clause Rewrites</h2>
+    <p>No clause rewrites have been generated yet.</p>
+</div>
+"""
+
+_REWRITES_SECTION_OPEN = """
+<div class="section">
+    <h2>✏️ AI-Generated Clause Rewrites</h2>
+    <p>The following clauses have been rewritten to improve balance and reduce risk:</p>
+"""
+
+_FALLBACKS_OPEN = """
+<h4>🎯 Alternative Negotiation Positions</h4>
+<ol>
+"""
+
+_DIV_CLOSE = "</div>"
+
+# Error fallbacks; details go to the log rather than into user-facing output
+_HTML_ERROR_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Report Generation Error</title></head>
+<body>
+    <h1>Report Generation Error</h1>
+    <p>There was an error generating the report.</p>
+    <p>Please try again or contact support.</p>
+</body>
+</html>
+"""
+
+# Static report fragments pre-encoded for callers that want bytes
+_UTF8_FRAGMENTS = {
+    fragment: fragment.encode('utf-8')
+    for fragment in (
+        _HEADER_PREFIX, _HEADER_SUFFIX, _FOOTER,
+        _RISK_SECTION_EMPTY, _RISK_SECTION_OPEN, _RISK_DETAILS_OPEN,
+        _REWRITES_SECTION_EMPTY, _REWRITES_SECTION_OPEN, _DIV_CLOSE
+    )
+}
+
+_HTML_ERROR_PAGE_UTF8 = _HTML_ERROR_PAGE.encode('utf-8')
+
+_PDF_ERROR_TEXT = (
+    "PDF Generation Error\n\nThere was an error creating the PDF report.\n\n"
+    "Please try generating an HTML report instead or contact support."
+)
+
+_PDF_ERROR_BYTES = b"%PDF-1.4\nERROR: Could not generate PDF"
+
+# Serialization options: drop and deduplicate unused objects, compress content streams
+_PDF_SAVE_OPTIONS = {'garbage': 4, 'clean': True, 'deflate': True}
+
+# Page geometry shared by every PDF page (1 inch margins); read-only, never mutated
+if PYMUPDF_AVAILABLE:
+    _PDF_BODY_RECT = fitz.Rect(72, 72, 523, 770)
+    _PDF_TITLE_ORIGIN = fitz.Point(72, 72)
+    _PDF_TITLED_BODY_RECT = fitz.Rect(72, 110, 523, 770)  # Leaves room for the title
+
+# Per-clause block of the detailed risk assessment
+_RISK_CLAUSE_TMPL = """
+<div class="clause-box {risk_class}">
+    <h4>{title} (Risk Score: {score})</h4>
+    <p><strong>Page:</strong> {page}</p>
+    <p><strong>Risk Factors:</strong> {factors}</p>
+    <p><strong>Rationale:</strong> {rationale}</p>
+    
+    <details>
+        <summary>View Full Clause Text</summary>
+        <div class="original-text">
+            {text}
+        </div>
+    </details>
+</div>
+"""
+
+# Whole rewritten-clause block; optional parts arrive pre-rendered or as empty strings
+_REWRITE_CLAUSE_TMPL = """
+<div class="clause-box">
+    <h3>{title}</h3>
+    <p><strong>Original Page:</strong> {page} | <strong>Risk Score:</strong> {score}</p>
+{original_block}
+    <h4>✏️ AI-Generated Rewrite</h4>
+    <div class="rewritten-text">
+        {rewrite}
+    </div>
+{rationale_block}{diff_block}
+    <details>
+        <summary>🎛️ Rewrite Parameters Used</summary>
+        <ul>
+            <li>Notice Period: {notice_days} days</li>
+            <li>Late Fee Percentage: {late_fee_percent}%</li>
+            <li>Jurisdiction Neutral: {jurisdiction_neutral}</li>
+            <li>Favor Customer: {favor_customer}</li>
+        </ul>
+    </details>
+</div>"""
+
+# Optional fragments of the rewritten-clause block
+_ORIGINAL_TEXT_TMPL = """
+    <h4>📋 Original Clause</h4>
+    <div class="original-text">
+        {text}
+    </div>
+"""
+
+_RATIONALE_TMPL = """
+    <h4>💡 Rationale</h4>
+    <div class="rationale">
+        {text}
+    </div>
+"""
+
+_FALLBACK_LI_TMPL = "<li>{text}</li>"
+
+_DIFF_TMPL = """
+    <h4>📊 Change Highlights</h4>
+    {diff_html}
+"""
+
+# Diff placeholders for rewrites with nothing to compare
+_DIFF_NO_REWRITE = "<p>No rewrite available.</p>"
+_DIFF_NO_CHANGES = "<p>No textual changes.</p>"
+
+_DIFF_ERROR_TMPL = """
+    <h4>📊 Change Highlights</h4>
+    <p>Unable to generate diff comparison: {error}</p>
+"""
+
+# Display names for known risk tags; unknown tags are title-cased
+_RISK_LABELS = {
+    'auto_renew': 'Auto-Renewal Clauses',
+    'unilateral_change': 'Unilateral Modification Rights',
+    'short_notice': 'Short Notice Periods',
+    'high_penalty': 'High Penalty Fees',
+    'exclusive_jurisdiction': 'Exclusive Jurisdiction',
+    'liability_limitation': 'Liability Limitations',
+    'broad_termination': 'Broad Termination Rights'
+}
+
+# Canonical order of the distribution list, so identical inputs give byte-identical reports
+_RISK_TAG_ORDER = tuple(_RISK_LABELS)
+
+
+@lru_cache(maxsize=256)
+def _humanize_tag(tag: str) -> str:
+    """Turn a risk tag like 'short_notice' into 'Short Notice'"""
+    # Interned so every clause carrying the tag shares one label object
+    return sys.intern(tag.replace('_', ' ').title())
+
+
+# Scores below 2 are low risk, below 4 medium, otherwise high
+_RISK_CLASS_THRESHOLDS = (2, 4)
+_RISK_CLASSES = ('risk-low', 'risk-medium', 'risk-high')
+
+# Same replacements as html.escape(quote=True), applied in a single pass
+_HTML_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#x27;'
+})
+
+
+def _esc(text: str) -> str:
+    """Escape text for HTML element content"""
+    return text.translate(_HTML_ESCAPE_TABLE)
+
+
+class PreparedClause(NamedTuple):
+    """Clause fields escaped and formatted once, shared by every HTML section"""
+    clause_id: str
+    text: str
+    page: Any
+    score: Any
+    risk_class: str
+    factors: str
+    title_html: str
+    text_html: str
+    rationale_html: str
+
+
 class ExportManager:
     """Manages export functionality for reports"""
     
@@ -14,242 +410,188 @@ class ExportManager:
         """Generate a comprehensive HTML report"""
         
         try:
-            document = report_data.get('document', {})
-            risky_clauses = report_data.get('risky_clauses', [])
-            rewrite_history = report_data.get('rewrite_history', [])
-            
-            # Build HTML report with error handling for each section
-            html_content = self._generate_html_header()
-            html_content += self._generate_report_summary(document, risky_clauses, rewrite_history)
-            html_content += self._generate_risk_analysis_section(risky_clauses)
-            html_content += self._generate_rewrites_section(risky_clauses, rewrite_history, options)
-            html_content += self._generate_html_footer()
-            
-            return html_content
+            return "".join(self.iter_html_report(report_data, options))
             
-        except Exception as e:
+        except Exception:
             # Return a basic error report if generation fails
-            return f"""
-            <!DOCTYPE html>
-            <html>
-            <head><title>Report Generation Error</title></head>
-            <body>
-                <h1>Report Generation Error</h1>
-                <p>There was an error generating the report: {html.escape(str(e))}</p>
-                <p>Please try again or contact support.</p>
-            </body>
-            </html>
-            """
+            logger.exception("HTML report generation failed")
+            return _HTML_ERROR_PAGE
+    
+    def generate_html_report_bytes(self, report_data: Dict[str, Any], options: Dict[str, Any]) -> bytes:
+        """Generate the HTML report as UTF-8 bytes, reusing the pre-encoded static fragments"""
+        
+        try:
+            return b"".join(
+                _UTF8_FRAGMENTS.get(fragment) or fragment.encode('utf-8')
+                for fragment in self.iter_html_report(report_data, options)
+            )
+            
+        except Exception:
+            logger.exception("HTML report generation failed")
+            return _HTML_ERROR_PAGE_UTF8
+    
+    def generate_html_report_to(self, stream: IO[str], report_data: Dict[str, Any], options: Dict[str, Any]) -> None:
+        """Write the HTML report fragment by fragment to a text stream without building it in memory"""
+        # Errors propagate, since part of the report may already have been written
+        stream.writelines(self.iter_html_report(report_data, options))
+    
+    def iter_html_report(self, report_data: Dict[str, Any], options: Dict[str, Any]) -> Iterator[str]:
+        """Stream the HTML report section by section, header first"""
+        
+        document = report_data.get('document', {})
+        risky_clauses = report_data.get('risky_clauses', [])
+        rewrite_history = report_data.get('rewrite_history', [])
+        
+        aggregates = self._compute_report_aggregates(risky_clauses, rewrite_history)
+        
+        yield from self._iter_html_header()
+        yield from self._iter_report_summary(document, aggregates)
+        yield from self._iter_risk_analysis_section(aggregates)
+        yield from self._iter_rewrites_section(aggregates['by_id'], rewrite_history, options)
+        yield from self._iter_html_footer()
     
     def generate_pdf_report(self, report_data: Dict[str, Any], options: Dict[str, Any]) -> bytes:
         """Generate an actual PDF document from report data"""
         
+        if not PYMUPDF_AVAILABLE:
+            logger.error("PDF report generation requires PyMuPDF")
+            return _PDF_ERROR_BYTES
+        
         try:
-            import fitz  # PyMuPDF
-            import tempfile
-            import os
-            
-            # Create a new PDF document
-            pdf_doc = fitz.open()  # Create new empty PDF
-            
             # Get document info
             document = report_data.get('document', {})
             risky_clauses = report_data.get('risky_clauses', [])
             rewrite_history = report_data.get('rewrite_history', [])
             
-            # Generate content sections
-            content_sections = self._generate_pdf_content_sections(document, risky_clauses, rewrite_history, options)
-            
-            # Create pages for each section
-            for section in content_sections:
-                page = pdf_doc.new_page()  # Standard A4 page
-                
-                # Insert text content
-                text_rect = fitz.Rect(72, 72, 523, 770)  # 1 inch margins
-                
-                # Insert title if present
-                if section.get('title'):
-                    title_rect = fitz.Rect(72, 72, 523, 100)
-                    page.insert_text(title_rect.tl, section['title'], 
-                                   fontsize=16, fontname="helv", color=(0, 0, 0))
-                    text_rect = fitz.Rect(72, 110, 523, 770)  # Adjust for title
+            # The document is closed on every exit path, including errors mid-render
+            with fitz.open() as pdf_doc:
+                # Create pages for each section as it is generated
+                for section in self._generate_pdf_content_sections(document, risky_clauses, rewrite_history, options):
+                    page = pdf_doc.new_page()  # Standard A4 page
+                    text_rect = _PDF_BODY_RECT
+                    
+                    # Insert title if present
+                    if section.get('title'):
+                        page.insert_text(_PDF_TITLE_ORIGIN, section['title'], 
+                                       fontsize=16, fontname="helv", color=(0, 0, 0))
+                        text_rect = _PDF_TITLED_BODY_RECT
+                    
+                    # Insert main content, wrapped and spilling onto extra pages
+                    if section.get('content'):
+                        self._insert_pdf_textbox(pdf_doc, page, text_rect, _PDF_BODY_RECT, section['content'])
                 
-                # Insert main content
-                if section.get('content'):
-                    page.insert_text(text_rect.tl, section['content'], 
-                                   fontsize=11, fontname="helv", color=(0, 0, 0))
-            
-            # Convert to bytes
-            pdf_bytes = pdf_doc.tobytes()
-            pdf_doc.close()
-            
-            return pdf_bytes
+                # Serialize straight to compacted, compressed bytes
+                return pdf_doc.tobytes(**_PDF_SAVE_OPTIONS)
             
-        except Exception as e:
+        except Exception:
+            logger.exception("PDF report generation failed")
             # Fallback: Create a simple error PDF
             try:
-                import fitz
-                error_pdf = fitz.open()
-                page = error_pdf.new_page()
-                text_rect = fitz.Rect(72, 72, 523, 770)
-                error_text = f"PDF Generation Error\n\nThere was an error creating the PDF report:\n{str(e)}\n\nPlease try generating an HTML report instead or contact support."
-                page.insert_text(text_rect.tl, error_text, fontsize=12, fontname="helv", color=(0, 0, 0))
-                error_bytes = error_pdf.tobytes()
-                error_pdf.close()
-                return error_bytes
+                with fitz.open() as error_pdf:
+                    page = error_pdf.new_page()
+                    page.insert_textbox(_PDF_BODY_RECT, _PDF_ERROR_TEXT, fontsize=12, fontname="helv", color=(0, 0, 0))
+                    return error_pdf.tobytes(**_PDF_SAVE_OPTIONS)
             except:
                 # Ultimate fallback: return minimal PDF-like content
-                return b"%PDF-1.4\nERROR: Could not generate PDF"
+                return _PDF_ERROR_BYTES
     
-    def _generate_html_header(self) -> str:
-        """Generate HTML header with styling"""
-        return """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Legal Redline Report</title>
-            <style>
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    padding: 20px;
-                    background-color: #f8f9fa;
-                }
-                .header {
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                    padding: 30px;
-                    border-radius: 10px;
-                    text-align: center;
-                    margin-bottom: 30px;
-                }
-                .header h1 {
-                    margin: 0;
-                    font-size: 2.5em;
-                }
-                .header p {
-                    margin: 10px 0 0;
-                    opacity: 0.9;
-                }
-                .section {
-                    background: white;
-                    padding: 25px;
-                    border-radius: 10px;
-                    margin-bottom: 25px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                }
-                .section h2 {
-                    color: #2c3e50;
-                    border-bottom: 3px solid #3498db;
-                    padding-bottom: 10px;
-                    margin-top: 0;
-                }
-                .metrics {
-                    display: flex;
-                    justify-content: space-around;
-                    flex-wrap: wrap;
-                    margin: 20px 0;
-                }
-                .metric {
-                    text-align: center;
-                    min-width: 150px;
-                    margin: 10px;
-                }
-                .metric .number {
-                    font-size: 2.5em;
-                    font-weight: bold;
-                    color: #3498db;
-                }
-                .metric .label {
-                    color: #7f8c8d;
-                    font-size: 0.9em;
-                }
-                .risk-high { border-left: 5px solid #e74c3c; }
-                .risk-medium { border-left: 5px solid #f39c12; }
-                .risk-low { border-left: 5px solid #27ae60; }
-                .clause-box {
-                    background: #f8f9fa;
-                    border: 1px solid #dee2e6;
-                    border-radius: 5px;
-                    padding: 20px;
-                    margin: 15px 0;
-                }
-                .original-text {
-                    background: #fff5f5;
-                    border-left: 4px solid #e53e3e;
-                    padding: 15px;
-                    margin: 10px 0;
-                    border-radius: 0 5px 5px 0;
-                }
-                .rewritten-text {
-                    background: #f0fff4;
-                    border-left: 4px solid #38a169;
-                    padding: 15px;
-                    margin: 10px 0;
-                    border-radius: 0 5px 5px 0;
-                }
-                .rationale {
-                    background: #e6f3ff;
-                    border: 1px solid #b3d9ff;
-                    padding: 15px;
-                    border-radius: 5px;
-                    margin: 10px 0;
-                }
-                .disclaimer {
-                    background: #fff3cd;
-                    border: 1px solid #ffeaa7;
-                    padding: 20px;
-                    border-radius: 10px;
-                    margin: 20px 0;
-                    text-align: center;
-                }
-                .footer {
-                    text-align: center;
-                    color: #7f8c8d;
-                    margin-top: 40px;
-                    padding-top: 20px;
-                    border-top: 1px solid #dee2e6;
-                }
-                @media (max-width: 768px) {
-                    .metrics {
-                        flex-direction: column;
-                        align-items: center;
-                    }
-                    .header h1 {
-                        font-size: 2em;
-                    }
-                }
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>⚖️ Legal Redline Report</h1>
-                <p>AI-Powered Contract Analysis and Clause Rewriting</p>
-                <p>Generated on: {}</p>
-            </div>
+    def _insert_pdf_textbox(self, pdf_doc, page, rect, continuation_rect, text: str) -> None:
+        """Write word-wrapped text into rect, continuing on new pages when it overflows"""
+        lines = text.split('\n')
+        fresh_page = False
+        while lines:
+            # A negative return means nothing was written because the text did not fit
+            if page.insert_textbox(rect, '\n'.join(lines), fontsize=11, fontname="helv", color=(0, 0, 0)) >= 0:
+                return
             
-            <div class="disclaimer">
-                <strong>⚠️ LEGAL DISCLAIMER:</strong> This report is generated by AI for informational purposes only 
-                and does not constitute legal advice. Always consult with a qualified attorney for legal matters.
-            </div>
-        """.format(datetime.now().strftime("%B %d, %Y at %I:%M %p"))
+            # Find the longest run of lines that fits
+            fitting = self._longest_fitting_prefix(page, rect, len(lines) - 1, lambda n: '\n'.join(lines[:n]))
+            if fitting:
+                page.insert_textbox(rect, '\n'.join(lines[:fitting]), fontsize=11, fontname="helv", color=(0, 0, 0))
+                lines = lines[fitting:]
+            else:
+                # The first line alone overflows (e.g. one very long unbroken token), so hard-wrap it by characters
+                first = lines[0]
+                cut = self._longest_fitting_prefix(page, rect, len(first) - 1, lambda n: first[:n])
+                if cut:
+                    page.insert_textbox(rect, first[:cut], fontsize=11, fontname="helv", color=(0, 0, 0))
+                    lines[0] = first[cut:]
+                elif fresh_page:
+                    # Not even one character fits on an empty page; report the loss rather than loop forever
+                    logger.warning("PDF export dropped a %d-character line that does not fit on a page", len(first))
+                    lines = lines[1:]
+                    continue
+            
+            page = pdf_doc.new_page()
+            rect = continuation_rect
+            fresh_page = True
     
-    def _generate_report_summary(self, document: Dict, risky_clauses: List, rewrite_history: Dict) -> str:
-        """Generate the report summary section"""
+    @staticmethod
+    def _longest_fitting_prefix(page, rect, limit: int, render) -> int:
+        """Binary-search the largest n <= limit whose render(n) fits in rect, probing on uncommitted shapes"""
+        lo, hi = 0, limit
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if page.new_shape().insert_textbox(rect, render(mid), fontsize=11, fontname="helv") >= 0:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+    
+    def _iter_html_header(self) -> Iterator[str]:
+        """Yield HTML header with styling"""
+        yield _HEADER_PREFIX
+        yield datetime.now().strftime("%B %d, %Y at %I:%M %p")
+        yield _HEADER_SUFFIX
+    
+    def _compute_report_aggregates(self, risky_clauses: List, rewrite_history: Dict) -> Dict[str, Any]:
+        """Compute the clause counts, average score, tag distribution and prepared clauses in one pass"""
         
-        total_rewrites = sum(len(rewrites) for rewrites in rewrite_history.values()) if rewrite_history else 0
-        avg_risk_score = sum(clause['risk_analysis']['score'] for clause in risky_clauses) / len(risky_clauses) if risky_clauses else 0
+        total_score = 0
+        risk_counts = Counter()
+        prepared = []
+        by_id = {}
+        for clause in risky_clauses:
+            risk_analysis = clause['risk_analysis']
+            risk_score = risk_analysis['score']
+            tags = risk_analysis['tags']
+            total_score += risk_score
+            risk_counts.update(tags)
+            
+            prepped = PreparedClause(
+                clause_id=clause['clause_id'],
+                text=clause['text'],
+                page=clause['page'],
+                score=risk_score,
+                risk_class=_RISK_CLASSES[bisect_right(_RISK_CLASS_THRESHOLDS, risk_score)],
+                factors=', '.join(map(_humanize_tag, tags)),
+                title_html=_esc(clause['title']),
+                text_html=_esc(clause['text']),
+                rationale_html=_esc(risk_analysis.get('rationale', 'No rationale provided'))
+            )
+            prepared.append(prepped)
+            by_id.setdefault(prepped.clause_id, prepped)
+        
+        n_risky = len(risky_clauses)
+        return {
+            'n_risky': n_risky,
+            'n_rewrites': len(rewrite_history),
+            'avg_risk': total_score / n_risky if n_risky else 0,
+            'risk_counts': risk_counts,
+            'prepared': prepared,
+            'by_id': by_id
+        }
+    
+    def _iter_report_summary(self, document: Dict, aggregates: Dict[str, Any]) -> Iterator[str]:
+        """Yield the report summary section"""
+        
+        n_risky = aggregates['n_risky']
         
         # Safely get document data
         total_pages = document.get('total_pages', 'N/A')
-        total_clauses = len(document.get('clauses', []))
+        total_clauses = len(document.get('clauses') or ())
         
-        return f"""
+        yield f"""
             <div class="section">
                 <h2>📊 Executive Summary</h2>
                 
@@ -263,20 +605,20 @@ class ExportManager:
                         <div class="label">Total Clauses</div>
                     </div>
                     <div class="metric">
-                        <div class="number">{len(risky_clauses)}</div>
+                        <div class="number">{n_risky}</div>
                         <div class="label">Risky Clauses</div>
                     </div>
                     <div class="metric">
-                        <div class="number">{len(rewrite_history)}</div>
+                        <div class="number">{aggregates['n_rewrites']}</div>
                         <div class="label">Clauses Rewritten</div>
                     </div>
                     <div class="metric">
-                        <div class="number">{avg_risk_score:.1f}</div>
+                        <div class="number">{aggregates['avg_risk']:.1f}</div>
                         <div class="label">Avg Risk Score</div>
                     </div>
                 </div>
                 
-                <p><strong>Document Analysis:</strong> This contract contains {len(risky_clauses)} potentially 
+                <p><strong>Document Analysis:</strong> This contract contains {n_risky} potentially 
                 problematic clauses that may warrant attention during negotiation or review.</p>
                 
                 <p><strong>Recommendations:</strong> Review the highlighted clauses and consider the suggested 
@@ -284,184 +626,114 @@ class ExportManager:
             </div>
         """
     
-    def _generate_risk_analysis_section(self, risky_clauses: List) -> str:
-        """Generate the risk analysis section"""
+    def _iter_risk_analysis_section(self, aggregates: Dict[str, Any]) -> Iterator[str]:
+        """Yield the risk analysis section"""
         
-        if not risky_clauses:
-            return """
-                <div class="section">
-                    <h2>🔍 Risk Analysis</h2>
-                    <p>No significant risks detected in the contract.</p>
-                </div>
-            """
-        
-        # Calculate risk distribution
-        risk_counts = {}
-        for clause in risky_clauses:
-            for tag in clause['risk_analysis']['tags']:
-                risk_counts[tag] = risk_counts.get(tag, 0) + 1
-        
-        risk_labels = {
-            'auto_renew': 'Auto-Renewal Clauses',
-            'unilateral_change': 'Unilateral Modification Rights',
-            'short_notice': 'Short Notice Periods',
-            'high_penalty': 'High Penalty Fees',
-            'exclusive_jurisdiction': 'Exclusive Jurisdiction',
-            'liability_limitation': 'Liability Limitations',
-            'broad_termination': 'Broad Termination Rights'
-        }
+        if not aggregates['prepared']:
+            yield _RISK_SECTION_EMPTY
+            return
         
-        risk_html = """
-            <div class="section">
-                <h2>🔍 Risk Analysis</h2>
-                
-                <h3>Risk Distribution</h3>
-                <ul>
-        """
+        yield _RISK_SECTION_OPEN
         
-        for tag, count in risk_counts.items():
-            label = risk_labels.get(tag, tag.replace('_', ' ').title())
-            risk_html += f"<li><strong>{label}:</strong> {count} clause(s)</li>"
+        # Known tags in canonical order, then any others alphabetically
+        risk_counts = aggregates['risk_counts']
+        ordered_tags = [tag for tag in _RISK_TAG_ORDER if risk_counts[tag]]
+        ordered_tags.extend(sorted(risk_counts.keys() - _RISK_LABELS.keys()))
+        yield "".join(
+            f"<li><strong>{_RISK_LABELS.get(tag) or _humanize_tag(tag)}:</strong> {risk_counts[tag]} clause(s)</li>"
+            for tag in ordered_tags
+        )
         
-        risk_html += """
-                </ul>
-                
-                <h3>Detailed Risk Assessment</h3>
-        """
+        yield _RISK_DETAILS_OPEN
         
-        for clause in risky_clauses:
-            risk_score = clause['risk_analysis']['score']
-            risk_class = 'risk-high' if risk_score >= 4 else 'risk-medium' if risk_score >= 2 else 'risk-low'
-            
-            risk_html += f"""
-                <div class="clause-box {risk_class}">
-                    <h4>{clause['title']} (Risk Score: {risk_score})</h4>
-                    <p><strong>Page:</strong> {clause['page']}</p>
-                    <p><strong>Risk Factors:</strong> {', '.join(tag.replace('_', ' ').title() for tag in clause['risk_analysis']['tags'])}</p>
-                    <p><strong>Rationale:</strong> {html.escape(clause['risk_analysis'].get('rationale', 'No rationale provided'))}</p>
-                    
-                    <details>
-                        <summary>View Full Clause Text</summary>
-                        <div class="original-text">
-                            {html.escape(clause['text'])}
-                        </div>
-                    </details>
-                </div>
-            """
+        for clause in aggregates['prepared']:
+            yield _RISK_CLAUSE_TMPL.format(
+                risk_class=clause.risk_class,
+                title=clause.title_html,
+                score=clause.score,
+                page=clause.page,
+                factors=clause.factors,
+                rationale=clause.rationale_html,
+                text=clause.text_html
+            )
         
-        risk_html += "</div>"
-        return risk_html
+        yield _DIV_CLOSE
     
-    def _generate_rewrites_section(self, risky_clauses: List, rewrite_history: Dict, options: Dict) -> str:
-        """Generate the rewrites section"""
+    def _iter_rewrites_section(self, clauses_by_id: Dict[str, PreparedClause], rewrite_history: Dict, options: Dict) -> Iterator[str]:
+        """Yield the rewrites section"""
         
         if not rewrite_history:
-            return """
-                <div class="section">
-                    <h2>✏️ Clause Rewrites</h2>
-                    <p>No clause rewrites have been generated yet.</p>
-                </div>
-            """
+            yield _REWRITES_SECTION_EMPTY
+            return
         
-        rewrites_html = """
-            <div class="section">
-                <h2>✏️ AI-Generated Clause Rewrites</h2>
-                <p>The following clauses have been rewritten to improve balance and reduce risk:</p>
-        """
+        yield _REWRITES_SECTION_OPEN
+        
+        include_original = options.get('include_original', True)
+        include_rationale = options.get('include_rationale', True)
+        include_diff = options.get('include_diff', True)
         
         for clause_id, rewrites in rewrite_history.items():
             # Find the corresponding clause
-            clause = next((c for c in risky_clauses if c['clause_id'] == clause_id), None)
+            clause = clauses_by_id.get(clause_id)
             if not clause:
                 continue
             
-            latest_rewrite = rewrites[-1]['result']
-            
-            rewrites_html += f"""
-                <div class="clause-box">
-                    <h3>{clause['title']}</h3>
-                    <p><strong>Original Page:</strong> {clause['page']} | <strong>Risk Score:</strong> {clause['risk_analysis']['score']}</p>
-            """
-            
-            if options.get('include_original', True):
-                rewrites_html += f"""
-                    <h4>📋 Original Clause</h4>
-                    <div class="original-text">
-                        {html.escape(clause['text'])}
-                    </div>
-                """
-            
-            rewrites_html += f"""
-                <h4>✏️ AI-Generated Rewrite</h4>
-                <div class="rewritten-text">
-                    {html.escape(latest_rewrite.get('rewrite', 'Rewrite not available'))}
-                </div>
-            """
+            # Pull every field the template needs once, up front
+            latest = rewrites[-1]
+            latest_rewrite = latest['result']
+            controls = latest['controls']
+            fallbacks = latest_rewrite.get('fallback_levels')
+            rewrite_text = latest_rewrite.get('rewrite') or ''
             
-            if options.get('include_rationale', True):
-                rewrites_html += f"""
-                    <h4>💡 Rationale</h4>
-                    <div class="rationale">
-                        {html.escape(latest_rewrite.get('rationale', 'Rationale not available'))}
-                    </div>
-                """
-                
-                if 'fallback_levels' in latest_rewrite and latest_rewrite['fallback_levels']:
-                    rewrites_html += """
-                        <h4>🎯 Alternative Negotiation Positions</h4>
-                        <ol>
-                    """
-                    for fallback in latest_rewrite['fallback_levels']:
-                        rewrites_html += f"<li>{html.escape(fallback)}</li>"
-                    rewrites_html += "</ol>"
+            original_block = _ORIGINAL_TEXT_TMPL.format(text=clause.text_html) if include_original else ''
             
-            if options.get('include_diff', True):
-                try:
-                    diff_html = self.diff_generator.generate_inline_diff(clause['text'], latest_rewrite.get('rewrite', ''))
-                    rewrites_html += f"""
-                        <h4>📊 Change Highlights</h4>
-                        {diff_html}
-                    """
-                except Exception as e:
-                    rewrites_html += f"""
-                        <h4>📊 Change Highlights</h4>
-                        <p>Unable to generate diff comparison: {html.escape(str(e))}</p>
-                    """
+            rationale_block = ''
+            if include_rationale:
+                rationale_block = _RATIONALE_TMPL.format(text=_esc(latest_rewrite.get('rationale', 'Rationale not available')))
+                if fallbacks:
+                    rationale_block += _FALLBACKS_OPEN + "".join(
+                        _FALLBACK_LI_TMPL.format(text=_esc(fallback)) for fallback in fallbacks
+                    ) + "</ol>"
             
-            # Show controls used
-            controls = rewrites[-1]['controls']
-            rewrites_html += f"""
-                <details>
-                    <summary>🎛️ Rewrite Parameters Used</summary>
-                    <ul>
-                        <li>Notice Period: {controls.get('notice_days', 'N/A')} days</li>
-                        <li>Late Fee Percentage: {controls.get('late_fee_percent', 'N/A')}%</li>
-                        <li>Jurisdiction Neutral: {'Yes' if controls.get('jurisdiction_neutral') else 'No'}</li>
-                        <li>Favor Customer: {'Yes' if controls.get('favor_customer') else 'No'}</li>
-                    </ul>
-                </details>
-            """
+            diff_block = ''
+            if include_diff:
+                # Empty and unchanged rewrites are not sent to the diff generator
+                if not rewrite_text:
+                    diff_block = _DIFF_TMPL.format(diff_html=_DIFF_NO_REWRITE)
+                elif rewrite_text == clause.text:
+                    diff_block = _DIFF_TMPL.format(diff_html=_DIFF_NO_CHANGES)
+                else:
+                    try:
+                        # Computed here, one clause at a time, so each fragment streams out as soon as it is ready
+                        diff_block = _DIFF_TMPL.format(diff_html=self.diff_generator.generate_inline_diff(clause.text, rewrite_text))
+                    except Exception as e:
+                        diff_block = _DIFF_ERROR_TMPL.format(error=_esc(str(e)))
             
-            rewrites_html += "</div>"
+            yield _REWRITE_CLAUSE_TMPL.format(
+                title=clause.title_html,
+                page=clause.page,
+                score=clause.score,
+                original_block=original_block,
+                rewrite=_esc(rewrite_text) if rewrite_text else 'Rewrite not available',
+                rationale_block=rationale_block,
+                diff_block=diff_block,
+                notice_days=controls.get('notice_days', 'N/A'),
+                late_fee_percent=controls.get('late_fee_percent', 'N/A'),
+                jurisdiction_neutral='Yes' if controls.get('jurisdiction_neutral') else 'No',
+                favor_customer='Yes' if controls.get('favor_customer') else 'No'
+            )
         
-        rewrites_html += "</div>"
-        return rewrites_html
+        yield _DIV_CLOSE
     
-    def _generate_html_footer(self) -> str:
-        """Generate HTML footer"""
-        return """
-            <div class="footer">
-                <p>Report generated by Legal Redline Sandbox</p>
-                <p>This AI-powered tool is designed to assist in contract review but does not replace professional legal advice.</p>
-                <p>&copy; 2025 Legal Redline Sandbox. All rights reserved.</p>
-            </div>
-        </body>
-        </html>
-        """
+    def _iter_html_footer(self) -> Iterator[str]:
+        """Yield HTML footer"""
+        yield _FOOTER
 
-    def export_clause_data(self, clause_data: Dict, rewrite_data: Dict) -> Dict[str, Any]:
+    def export_clause_data(self, clause_data: Dict, rewrite_data: Dict, timestamp: Optional[str] = None) -> Dict[str, Any]:
         """Export individual clause data for external use"""
         
+        rewrite_text = rewrite_data.get('rewrite', '')
+        
         export_data = {
             'clause_info': {
                 'id': clause_data['clause_id'],
@@ -472,25 +744,26 @@ class ExportManager:
             },
             'risk_analysis': clause_data.get('risk_analysis', {}),
             'rewrite_info': {
-                'rewritten_text': rewrite_data.get('rewrite', ''),
+                'rewritten_text': rewrite_text,
                 'rationale': rewrite_data.get('rationale', ''),
                 'fallback_options': rewrite_data.get('fallback_levels', []),
                 'risk_reduction': rewrite_data.get('risk_reduction', ''),
                 'controls_used': rewrite_data.get('controls_used', {}),
                 'api_model': rewrite_data.get('api_model', ''),
-                'generation_timestamp': datetime.now().isoformat()
+                # Batch exports pass one shared timestamp instead of stamping each clause
+                'generation_timestamp': timestamp or datetime.now().isoformat()
             },
+            # Identical rewrites hit the diff generator's no-change fast path
             'change_analysis': self.diff_generator.generate_summary_diff(
                 clause_data['text'], 
-                rewrite_data.get('rewrite', '')
-            ) if rewrite_data.get('rewrite') else {}
+                rewrite_text
+            ) if rewrite_text else {}
         }
         
         return export_data
     
-    def _generate_pdf_content_sections(self, document: Dict, risky_clauses: List, rewrite_history: List, options: Dict) -> List[Dict]:
-        """Generate content sections for PDF creation"""
-        sections = []
+    def _generate_pdf_content_sections(self, document: Dict, risky_clauses: List, rewrite_history: Union[Dict, List], options: Dict) -> Iterator[Dict]:
+        """Yield content sections for PDF creation, one page-group at a time"""
         
         # Title page
         title_section = {
@@ -505,12 +778,18 @@ Report Summary:
 This report contains analysis of contract clauses, risk assessments, and suggested improvements for legal documents.
 """
         }
-        sections.append(title_section)
+        yield title_section
         
         # Executive Summary
-        high_risk_count = len([c for c in risky_clauses if c.get('risk_score', 0) >= 70])
-        medium_risk_count = len([c for c in risky_clauses if 40 <= c.get('risk_score', 0) < 70])
-        low_risk_count = len([c for c in risky_clauses if c.get('risk_score', 0) < 40])
+        high_risk_count = medium_risk_count = low_risk_count = 0
+        for c in risky_clauses:
+            score = c.get('risk_score', 0)
+            if score >= 70:
+                high_risk_count += 1
+            elif score >= 40:
+                medium_risk_count += 1
+            else:
+                low_risk_count += 1
         
         summary_section = {
             'title': 'Executive Summary',
@@ -524,36 +803,51 @@ Key Findings:
 The document analysis identified {len(risky_clauses)} clauses requiring attention. Priority should be given to high-risk clauses that may expose the organization to significant legal or financial liability.
 """
         }
-        sections.append(summary_section)
+        yield summary_section
         
         # Risk Analysis Details
         if risky_clauses:
+            # Latest rewrite result per clause, indexed once instead of scanned per clause
+            rewrites_by_clause = {}
+            if isinstance(rewrite_history, dict):
+                # Same {clause_id: [{'result': ..., 'controls': ...}, ...]} shape the HTML report uses
+                for clause_id, rewrites in rewrite_history.items():
+                    if rewrites:
+                        rewrites_by_clause[clause_id] = rewrites[-1]['result']
+            else:
+                # Legacy flat list of rewrite results carrying their own clause_id
+                for r in rewrite_history:
+                    rewrites_by_clause.setdefault(r.get('clause_id'), r)
+            
             for i, clause in enumerate(risky_clauses[:10], 1):  # Limit to first 10 clauses
-                clause_content = f"""
+                text = clause.get('text', 'No text available')
+                text_preview = text if len(text) <= 500 else text[:500] + '...'
+                parts = [f"""
 Clause #{i}: {clause.get('title', 'Untitled Clause')}
 Risk Score: {clause.get('risk_score', 'Unknown')}/100
 Page: {clause.get('page', 'Unknown')}
 
 Original Text:
-{clause.get('text', 'No text available')[:500]}{'...' if len(clause.get('text', '')) > 500 else ''}
+{text_preview}
 
 Risk Factors:
-"""
+"""]
                 
                 # Add risk tags if available
                 if clause.get('risk_analysis', {}).get('tags'):
-                    for tag in clause['risk_analysis']['tags']:
-                        clause_content += f"• {tag.replace('_', ' ').title()}\n"
+                    parts.extend(f"• {_humanize_tag(tag)}\n" for tag in clause['risk_analysis']['tags'])
                 
                 # Add rewrite suggestion if available
-                rewrite = next((r for r in rewrite_history if r.get('clause_id') == clause.get('clause_id')), None)
+                rewrite = rewrites_by_clause.get(clause.get('clause_id'))
                 if rewrite:
-                    clause_content += f"\nSuggested Improvement:\n{rewrite.get('rewrite', 'No rewrite available')[:300]}{'...' if len(rewrite.get('rewrite', '')) > 300 else ''}"
+                    rewrite_text = rewrite.get('rewrite', 'No rewrite available')
+                    rewrite_preview = rewrite_text if len(rewrite_text) <= 300 else rewrite_text[:300] + '...'
+                    parts.append(f"\nSuggested Improvement:\n{rewrite_preview}")
                 
-                sections.append({
+                yield {
                     'title': f'Clause Analysis #{i}',
-                    'content': clause_content
-                })
+                    'content': "".join(parts)
+                }
         
         # Recommendations
         recommendations_section = {
@@ -580,6 +874,4 @@ Based on the analysis of {len(risky_clauses)} clauses, we recommend:
 This analysis was generated using AI-powered contract review tools. Always consult with qualified legal counsel before making contract modifications.
 """
         }
-        sections.append(recommendations_section)
-        
-        return sections
+        yield recommendations_section
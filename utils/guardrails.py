@@ -6,9 +6,54 @@ Provides protective measures for AI-powered legal document processing
 import re
 import os
 import time
+import threading
 from typing import Dict, List, Any, Optional, Tuple
 from functools import wraps
-from collections import defaultdict, deque
+from bisect import bisect_left
+from collections import OrderedDict, deque
+
+# RE2 matches in linear time, so user-controlled text cannot trigger catastrophic backtracking
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+
+def _compile_scan_pattern(pattern: str, ignore_case: bool = False):
+    """Compile a pattern used to scan user input, with RE2 when installed and re otherwise"""
+    if RE2_AVAILABLE:
+        options = re2.Options()
+        options.case_sensitive = not ignore_case
+        # Compiled for UTF-8 bytes: given str, the re2 wrapper re-encodes it and maps offsets back on every call
+        return re2.compile(pattern.encode(), options)
+    return re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+
+
+def _scan_subject(text: str):
+    """Text in the form the scan patterns are compiled for: UTF-8 bytes under RE2, str otherwise"""
+    # surrogatepass keeps unpaired surrogates from PDF extraction round-trippable
+    return text.encode('utf-8', 'surrogatepass') if RE2_AVAILABLE else text
+
+
+def _scan_result(subject) -> str:
+    """Inverse of _scan_subject"""
+    return subject.decode('utf-8', 'surrogatepass') if isinstance(subject, bytes) else subject
+
+
+# Markup and script fragments stripped by InputValidator.sanitize_text
+_HTML_TAG_RE = _compile_scan_pattern(r'<[^>]+>')
+_JS_PROTOCOL_RE = _compile_scan_pattern(r'javascript:', ignore_case=True)
+_EVENT_HANDLER_RE = _compile_scan_pattern(r'on\w+\s*=', ignore_case=True)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _matched_group(match) -> str:
+    """Name of the named alternative that produced a combined-pattern match"""
+    # groupdict() rather than lastgroup, which RE2 match objects may not provide
+    name = next(name for name, value in match.groupdict().items() if value is not None)
+    # RE2 names the groups of a bytes pattern with bytes
+    return name.decode() if isinstance(name, bytes) else name
 
 
 class InputValidator:
@@ -23,8 +68,8 @@ class InputValidator:
     # Allowed file extensions
     ALLOWED_EXTENSIONS = {'.pdf', '.txt', '.doc', '.docx'}
     
-    # Suspicious patterns that could indicate injection attacks
-    SUSPICIOUS_PATTERNS = [
+    # Suspicious patterns that could indicate injection attacks, compiled once at import
+    SUSPICIOUS_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
         r'<script[^>]*>.*?</script>',  # Script tags
         r'javascript:',  # JavaScript protocol
         r'on\w+\s*=',  # Event handlers
@@ -33,7 +78,13 @@ class InputValidator:
         r'exec\s*\(',  # Exec calls
         r'\$\{.*?\}',  # Template literals (potential code injection)
         r'`.*?`',  # Backticks (template strings)
-    ]
+    )]
+    
+    # Substring prefilter: must include a required character of every pattern in SUSPICIOUS_PATTERNS
+    _SUSPICIOUS_SENTINELS = ('<', '`', '$', '=', '(', ':')
+    
+    # All suspicious patterns as one alternation, so input is scanned once
+    _SUSPICIOUS_RE = _compile_scan_pattern('|'.join(f'(?:{p.pattern})' for p in SUSPICIOUS_PATTERNS), ignore_case=True)
     
     @staticmethod
     def validate_text_input(text: str, max_length: int = None) -> Tuple[bool, str]:
@@ -57,10 +108,10 @@ class InputValidator:
         if len(text) > max_len:
             return False, f"Input exceeds maximum length of {max_len} characters"
         
-        # Check for suspicious patterns
-        for pattern in InputValidator.SUSPICIOUS_PATTERNS:
-            if re.search(pattern, text, re.IGNORECASE):
-                return False, "Input contains potentially unsafe content"
+        # Check for suspicious patterns; cheap substring checks rule most text out first
+        if (any(c in text for c in InputValidator._SUSPICIOUS_SENTINELS)
+                and InputValidator._SUSPICIOUS_RE.search(_scan_subject(text))):
+            return False, "Input contains potentially unsafe content"
         
         return True, ""
     
@@ -111,15 +162,21 @@ class InputValidator:
         if not isinstance(text, str):
             return ""
         
+        # Convert once for all the substitutions below
+        subject = _scan_subject(text)
+        empty = subject[:0]
+        
         # Remove HTML/script tags
-        text = re.sub(r'<[^>]+>', '', text)
+        subject = _HTML_TAG_RE.sub(empty, subject)
         
         # Remove potential code execution patterns
-        text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'on\w+\s*=', '', text, flags=re.IGNORECASE)
+        subject = _JS_PROTOCOL_RE.sub(empty, subject)
+        subject = _EVENT_HANDLER_RE.sub(empty, subject)
+        
+        text = _scan_result(subject)
         
         # Normalize whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         
         return text.strip()
     
@@ -153,6 +210,9 @@ class InputValidator:
 class RateLimiter:
     """Rate limiting to prevent abuse and manage API costs"""
     
+    # Identifiers tracked at once; the least recently seen are dropped beyond this
+    MAX_TRACKED_IDENTIFIERS = 10_000
+    
     def __init__(self, max_requests: int = 100, time_window: int = 60):
         """
         Initialize rate limiter
@@ -161,9 +221,14 @@ class RateLimiter:
             max_requests: Maximum requests allowed in time window
             time_window: Time window in seconds
         """
+        if max_requests < 1:
+            raise ValueError(f"max_requests must be at least 1, got {max_requests}")
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests = defaultdict(deque)
+        # identifier -> timestamps of its most recent requests, oldest first, in LRU order
+        self.requests = OrderedDict()
+        # Decorated functions are called from executor threads; checking and recording must be atomic
+        self._lock = threading.Lock()
     
     def is_allowed(self, identifier: str) -> Tuple[bool, str]:
         """
@@ -175,52 +240,93 @@ class RateLimiter:
         Returns:
             Tuple of (is_allowed, error_message)
         """
-        now = time.time()
-        user_requests = self.requests[identifier]
-        
-        # Remove old requests outside the time window
-        while user_requests and user_requests[0] < now - self.time_window:
-            user_requests.popleft()
-        
-        # Check if limit exceeded
-        if len(user_requests) >= self.max_requests:
-            return False, f"Rate limit exceeded. Maximum {self.max_requests} requests per {self.time_window} seconds."
+        allowed, _, error = self.is_allowed_with_quota(identifier)
+        return allowed, error
+    
+    def is_allowed_with_quota(self, identifier: str) -> Tuple[bool, int, str]:
+        """
+        Check if request is allowed and report the quota left, in one pass
         
-        # Add current request
-        user_requests.append(now)
-        return True, ""
+        Args:
+            identifier: Unique identifier (e.g., user_id, IP address)
+            
+        Returns:
+            Tuple of (is_allowed, remaining_quota, error_message)
+        """
+        with self._lock:
+            now = time.time()
+            user_requests = self.requests.get(identifier)
+            
+            if user_requests is None:
+                # Bounded deque: appending to a full one drops the oldest timestamp
+                user_requests = self.requests[identifier] = deque(maxlen=self.max_requests)
+                if len(self.requests) > self.MAX_TRACKED_IDENTIFIERS:
+                    self.requests.popitem(last=False)
+            else:
+                self.requests.move_to_end(identifier)
+            
+            # Limit exceeded only if the window is full and its oldest request is still inside it
+            if len(user_requests) == self.max_requests and user_requests[0] >= now - self.time_window:
+                return False, 0, f"Rate limit exceeded. Maximum {self.max_requests} requests per {self.time_window} seconds."
+            
+            # Add current request
+            user_requests.append(now)
+            return True, self._remaining(user_requests, now), ""
     
     def get_remaining_quota(self, identifier: str) -> int:
         """Get remaining quota for identifier"""
-        now = time.time()
-        user_requests = self.requests[identifier]
-        
-        # Clean old requests
-        while user_requests and user_requests[0] < now - self.time_window:
-            user_requests.popleft()
-        
-        return max(0, self.max_requests - len(user_requests))
+        with self._lock:
+            user_requests = self.requests.get(identifier)
+            if user_requests is None:
+                return self.max_requests
+            return self._remaining(user_requests, time.time())
+    
+    def _remaining(self, user_requests: deque, now: float) -> int:
+        """Quota left given an identifier's timestamps, oldest first"""
+        # Timestamps are sorted, so the expired ones are a prefix found by bisection rather than purged
+        in_window = len(user_requests) - bisect_left(user_requests, now - self.time_window)
+        return max(0, self.max_requests - in_window)
 
 
 class ContentFilter:
     """Filters and validates content for appropriateness"""
     
     # Patterns that should not appear in legal documents
-    FORBIDDEN_TERMS = [
+    FORBIDDEN_TERMS = [re.compile(p, re.IGNORECASE) for p in (
         r'\b(hack|exploit|bypass|circumvent)\s+(security|system)\b',
         r'\b(illegal|unlawful)\s+(activity|action|purpose)\b',
         r'\bmalware\b',
         r'\bransomware\b',
-    ]
+    )]
+    
+    # Forbidden terms as one alternation; group f<i> tells which pattern fired
+    _FORBIDDEN_RE = _compile_scan_pattern('|'.join(f'(?P<f{i}>{p.pattern})' for i, p in enumerate(FORBIDDEN_TERMS)), ignore_case=True)
     
     # Patterns indicating PII that should be warned about
     PII_PATTERNS = {
-        'ssn': r'\b\d{3}-\d{2}-\d{4}\b',
-        'credit_card': r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b',
-        'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-        'phone': r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
+        'ssn': re.compile(r'\b\d{3}-\d{2}-\d{4}\b'),
+        'credit_card': re.compile(r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b'),
+        'email': re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
+        'phone': re.compile(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'),
     }
     
+    # Fewest digits any numeric PII pattern needs (an SSN); emails need an '@' instead
+    _PII_MIN_DIGITS = 9
+    
+    # All PII patterns as one alternation: a single scan rules out PII-free text before the per-type counts.
+    # Plain re, so it matches exactly when one of PII_PATTERNS does (RE2's \d and \b are ASCII-only).
+    _PII_RE = re.compile('|'.join(f'(?:{p.pattern})' for p in PII_PATTERNS.values()))
+    
+    # Common legal terms; a legal document should contain at least two of them
+    LEGAL_TERMS = (
+        'agreement', 'contract', 'party', 'parties', 'clause', 'section',
+        'terms', 'conditions', 'hereby', 'whereas', 'herein', 'therefore',
+        'shall', 'liability', 'indemnify', 'terminate', 'jurisdiction'
+    )
+    
+    # One pass finds them all; ASCII-only case folding matches lower() for these ASCII terms
+    _LEGAL_TERMS_RE = re.compile('|'.join(map(re.escape, LEGAL_TERMS)), re.IGNORECASE | re.ASCII)
+    
     @staticmethod
     def check_forbidden_content(text: str) -> Tuple[bool, List[str]]:
         """
@@ -232,11 +338,18 @@ class ContentFilter:
         Returns:
             Tuple of (has_forbidden_content, list_of_issues)
         """
-        issues = []
-        
-        for pattern in ContentFilter.FORBIDDEN_TERMS:
-            if re.search(pattern, text, re.IGNORECASE):
-                issues.append(f"Text contains forbidden term matching pattern: {pattern}")
+        # Single pass over the text, collecting which patterns matched
+        fired = set()
+        for match in ContentFilter._FORBIDDEN_RE.finditer(_scan_subject(text)):
+            fired.add(int(_matched_group(match)[1:]))
+            if len(fired) == len(ContentFilter.FORBIDDEN_TERMS):
+                break
+        
+        issues = [
+            f"Text contains forbidden term matching pattern: {pattern.pattern}"
+            for i, pattern in enumerate(ContentFilter.FORBIDDEN_TERMS)
+            if i in fired
+        ]
         
         return len(issues) > 0, issues
     
@@ -251,14 +364,23 @@ class ContentFilter:
         Returns:
             Dictionary with PII types and counts
         """
-        pii_found = {}
+        # Text with no '@' and too few digits cannot match; only safe for ASCII, as re's \d is Unicode-aware
+        if (text.isascii() and '@' not in text
+                and sum(map(text.count, '0123456789')) < ContentFilter._PII_MIN_DIGITS):
+            return {}
+        
+        if not ContentFilter._PII_RE.search(text):
+            return {}
         
+        # Each type is counted on its own, so PII nested inside another match (a phone number
+        # within an email address) is still reported
+        detected = {}
         for pii_type, pattern in ContentFilter.PII_PATTERNS.items():
-            matches = re.findall(pattern, text)
-            if matches:
-                pii_found[pii_type] = len(matches)
+            count = len(pattern.findall(text))
+            if count:
+                detected[pii_type] = count
         
-        return pii_found
+        return detected
     
     @staticmethod
     def validate_legal_context(text: str) -> Tuple[bool, str]:
@@ -275,17 +397,17 @@ class ContentFilter:
         if len(text.strip()) < 50:
             return False, "Text too short to be a valid legal document"
         
-        # Check for common legal terms (at least one should be present)
-        legal_terms = [
-            'agreement', 'contract', 'party', 'parties', 'clause', 'section',
-            'terms', 'conditions', 'hereby', 'whereas', 'herein', 'therefore',
-            'shall', 'liability', 'indemnify', 'terminate', 'jurisdiction'
-        ]
+        # Check for common legal terms, stopping as soon as two distinct ones are seen
+        found_terms = set()
+        for match in ContentFilter._LEGAL_TERMS_RE.finditer(text):
+            found_terms.add(match.group().lower())
+            if len(found_terms) >= 2:
+                return True, ""
         
+        # Non-overlapping matches can hide a term that shares letters with another,
+        # so confirm a negative with the exhaustive per-term check
         text_lower = text.lower()
-        found_terms = sum(1 for term in legal_terms if term in text_lower)
-        
-        if found_terms < 2:
+        if sum(1 for term in ContentFilter.LEGAL_TERMS if term in text_lower) < 2:
             return False, "Text does not appear to contain legal content"
         
         return True, ""
@@ -1,6 +1,12 @@
 import fitz  # PyMuPDF
 import re
 import os
+import copy
+import threading
+from collections import OrderedDict
+from hashlib import blake2b
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
 from typing import Dict, List, Any
 from .guardrails import InputValidator, ContentFilter
 
@@ -12,11 +18,43 @@ except ImportError:
     OCR_AVAILABLE = False
     print("Warning: OCR functionality not available. Install Google Cloud libraries for OCR support.")
 
+# RE2 splits in linear time, with no backtracking on long all-caps runs
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+# Header lines that start a new clause/section: numbered sections, headers, etc.
+_SECTION_SPLIT_RE = re.compile(r'(\n\s*(?:\d+\.|\d+\s+[A-Z]|[A-Z][A-Z\s]{3,}:?)\s*[^\n]*\n)', re.MULTILINE)
+
+# RE2 twin of _SECTION_SPLIT_RE for ASCII text. RE2's \s omits \v and \x1c-\x1f, so the
+# whitespace Python's \s matches in ASCII is spelled out to keep the splits identical.
+if RE2_AVAILABLE:
+    _SECTION_SPLIT_RE2 = re2.compile(
+        r'(\n[ \t\n\r\f\v\x1c-\x1f]*(?:\d+\.|\d+[ \t\n\r\f\v\x1c-\x1f]+[A-Z]|[A-Z][A-Z \t\n\r\f\v\x1c-\x1f]{3,}:?)'
+        r'[ \t\n\r\f\v\x1c-\x1f]*[^\n]*\n)'
+    )
+_SECTION_HEADER_RE = re.compile(r'^\s*(?:\d+\.|\d+\s+[A-Z]|[A-Z][A-Z\s]{3,}:?)\s*')
+
+# Maximum number of OCR results kept per processor, keyed by file content hash
+_OCR_CACHE_SIZE = 32
+
+
+def _iter_split_pieces(splitter, text: str):
+    """Yield (offset, piece) for each piece splitter.split(text) would return, without building the list"""
+    pos = 0
+    for match in splitter.finditer(text):
+        yield pos, text[pos:match.start()]
+        yield match.start(), match.group(1)
+        pos = match.end()
+    yield pos, text[pos:]
+
 class PDFProcessor:
     """Handles PDF processing and text extraction"""
     
     def __init__(self):
-        self.clause_patterns = [
+        self.clause_patterns = [re.compile(p) for p in (
             r'^\d+\.\s*',  # "1. " or "1."
             r'^[A-Z][A-Z\s]+:?',  # "TERMINATION:" or "TERMINATION"
             r'^\([a-z]\)',  # "(a)"
@@ -24,13 +62,17 @@ class PDFProcessor:
             r'^Article\s+\d+',  # "Article 1"
             r'^Section\s+\d+',  # "Section 1"
             r'^\d+\s+[A-Z][A-Za-z\s]+',  # "1 TERMINATION" style headers
-        ]
+        )]
+        # All title patterns as one alternation, tried in the same order
+        self._clause_title_re = re.compile('|'.join(f'(?:{p.pattern})' for p in self.clause_patterns))
         
         # OCR configuration
         self.ocr_credentials_path = None
         self.ocr_processor_id = None
         self.ocr_api_key = None
         self.ocr_enabled = OCR_AVAILABLE
+        self._ocr_cache = OrderedDict()
+        self._ocr_cache_lock = threading.Lock()
     
     def process_pdf(self, file_path: str) -> Dict[str, Any]:
         """Process PDF and extract structured data"""
@@ -59,17 +101,13 @@ class PDFProcessor:
                 raise ValueError(f"Document has too many pages: {len(doc)} (max {max_pages})")
             
             # Extract text from all pages
-            full_text = ""
-            page_texts = []
+            texts = [page.get_text("text") for page in doc]
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                page_text = page.get_text("text")
-                page_texts.append({
-                    'page_number': page_num + 1,
-                    'text': page_text
-                })
-                full_text += page_text + "\n"
+            page_texts = [
+                {'page_number': page_num + 1, 'text': page_text}
+                for page_num, page_text in enumerate(texts)
+            ]
+            full_text = "".join(page_text + "\n" for page_text in texts)
             
             # Validate that document appears to be legal content
             is_legal, msg = ContentFilter.validate_legal_context(full_text)
@@ -84,8 +122,8 @@ class PDFProcessor:
             # Extract clauses
             clauses = self._extract_clauses(page_texts)
             
-            # Calculate statistics
-            word_count = len(full_text.split())
+            # Calculate statistics; counting page by page keeps only one page's word list alive
+            word_count = sum(len(page_text.split()) for page_text in texts)
             
             document_data = {
                 'total_pages': len(doc),
@@ -111,69 +149,80 @@ class PDFProcessor:
         clause_counter = 1
         
         # Combine all text first, then process
-        full_text = ""
-        page_map = {}  # Track which text belongs to which page
+        text_parts = []
+        # Track which text belongs to which page: sorted start offsets and their page numbers
+        page_starts = []
+        page_numbers = []
         
+        end_pos = 0
         for page_data in page_texts:
-            page_num = page_data['page_number']
-            text = page_data['text']
-            start_pos = len(full_text)
-            full_text += text + "\n\n"
-            end_pos = len(full_text)
-            page_map[(start_pos, end_pos)] = page_num
+            page_text = page_data['text'] + "\n\n"
+            page_starts.append(end_pos)
+            page_numbers.append(page_data['page_number'])
+            end_pos += len(page_text)
+            text_parts.append(page_text)
+        full_text = "".join(text_parts)
         
         # Split by patterns that indicate new clauses/sections
         # Look for numbered sections, headers, etc.
-        section_splits = re.split(r'(\n\s*(?:\d+\.|\d+\s+[A-Z]|[A-Z][A-Z\s]{3,}:?)\s*[^\n]*\n)', full_text, flags=re.MULTILINE)
+        splitter = _SECTION_SPLIT_RE2 if RE2_AVAILABLE and full_text.isascii() else _SECTION_SPLIT_RE
         
-        current_section = ""
+        # Pieces of the section being accumulated, joined only when it is emitted
+        section_parts = []
+        section_start = 0
         current_title = ""
         
-        for i, section in enumerate(section_splits):
-            section = section.strip()
+        for piece_start, raw_section in _iter_split_pieces(splitter, full_text):
+            section = raw_section.strip()
             if not section:
                 continue
+            start_pos = piece_start + len(raw_section) - len(raw_section.lstrip())
             
             # Check if this looks like a section header
-            is_header = bool(re.match(r'^\s*(?:\d+\.|\d+\s+[A-Z]|[A-Z][A-Z\s]{3,}:?)\s*', section))
+            is_header = bool(_SECTION_HEADER_RE.match(section))
             
-            if is_header and current_section:
-                # Save the previous section if it's substantial
-                if len(current_section.split()) >= 20:
+            if is_header and section_parts:
+                current_section = "\n".join(section_parts)
+                
+                # Save the previous section if it's substantial; its words are counted once
+                word_count = len(current_section.split())
+                if word_count >= 20:
                     # Find which page this belongs to
-                    page_num = self._find_page_for_text_position(len(full_text) - len(current_section), page_map)
+                    page_num = self._find_page_for_text_position(section_start, page_starts, page_numbers)
                     
                     clause = {
                         'clause_id': f"clause_{clause_counter}",
                         'title': current_title or self._extract_clause_title(current_section[:100]),
                         'text': current_section.strip(),
                         'page': page_num,
-                        'word_count': len(current_section.split())
+                        'word_count': word_count
                     }
                     clauses.append(clause)
                     clause_counter += 1
                 
                 # Start new section
-                current_section = section
+                section_parts = [section]
+                section_start = start_pos
                 current_title = self._extract_clause_title(section)
             else:
                 # Accumulate content
-                if current_section:
-                    current_section += "\n" + section
-                else:
-                    current_section = section
+                if not section_parts:
+                    section_start = start_pos
                     if not current_title:
                         current_title = self._extract_clause_title(section[:100])
+                section_parts.append(section)
         
         # Don't forget the last section
-        if current_section and len(current_section.split()) >= 20:
-            page_num = self._find_page_for_text_position(len(full_text) - len(current_section), page_map)
+        current_section = "\n".join(section_parts)
+        word_count = len(current_section.split())
+        if word_count >= 20:
+            page_num = self._find_page_for_text_position(section_start, page_starts, page_numbers)
             clause = {
                 'clause_id': f"clause_{clause_counter}",
                 'title': current_title or self._extract_clause_title(current_section[:100]),
                 'text': current_section.strip(),
                 'page': page_num,
-                'word_count': len(current_section.split())
+                'word_count': word_count
             }
             clauses.append(clause)
             clause_counter += 1
@@ -188,35 +237,29 @@ class PDFProcessor:
             all_text = " ".join([page['text'] for page in page_texts])
             chunks = [chunk.strip() for chunk in all_text.split('\n\n') if chunk.strip()]
             
-            # Group small chunks together to form meaningful clauses
-            current_chunk = ""
-            for chunk in chunks:
-                if len(current_chunk.split()) < 30:
-                    current_chunk += " " + chunk if current_chunk else chunk
-                else:
-                    # Save current chunk and start new one
-                    if len(current_chunk.split()) >= 15:
-                        clause = {
-                            'clause_id': f"clause_{clause_counter}",
-                            'title': self._extract_clause_title(current_chunk[:100]),
-                            'text': current_chunk.strip(),
-                            'page': 1,  # Default to page 1 for fallback
-                            'word_count': len(current_chunk.split())
-                        }
-                        clauses.append(clause)
-                        clause_counter += 1
-                    current_chunk = chunk
-            
-            # Add the last chunk
-            if current_chunk and len(current_chunk.split()) >= 15:
-                clause = {
-                    'clause_id': f"clause_{clause_counter}",
-                    'title': self._extract_clause_title(current_chunk[:100]),
-                    'text': current_chunk.strip(),
-                    'page': 1,
-                    'word_count': len(current_chunk.split())
-                }
-                clauses.append(clause)
+            # Group small chunks together to form meaningful clauses. A group takes chunks until it
+            # reaches 30 words, including the chunk that crosses the line; prefix sums of the per-chunk
+            # word counts let each group boundary be found with one bisect.
+            word_totals = list(accumulate(len(chunk.split()) for chunk in chunks))
+            start = 0
+            while start < len(chunks):
+                base = word_totals[start - 1] if start else 0
+                end = min(bisect_left(word_totals, base + 30, lo=start) + 1, len(chunks))
+                group_words = word_totals[end - 1] - base
+                
+                if group_words >= 15:
+                    current_chunk = " ".join(chunks[start:end])
+                    clause = {
+                        'clause_id': f"clause_{clause_counter}",
+                        'title': self._extract_clause_title(current_chunk[:100]),
+                        'text': current_chunk,
+                        'page': 1,  # Default to page 1 for fallback
+                        'word_count': group_words
+                    }
+                    clauses.append(clause)
+                    clause_counter += 1
+                
+                start = end
         
         print(f"Extracted {len(clauses)} clauses")
         for clause in clauses:
@@ -224,30 +267,29 @@ class PDFProcessor:
         
         return clauses
     
-    def _find_page_for_text_position(self, position: int, page_map: dict) -> int:
+    def _find_page_for_text_position(self, position: int, page_starts: List[int], page_numbers: List[int]) -> int:
         """Find which page a text position belongs to"""
-        for (start, end), page_num in page_map.items():
-            if start <= position < end:
-                return page_num
-        return 1  # Default to page 1
+        idx = bisect_right(page_starts, position) - 1
+        if idx < 0:
+            return 1  # Default to page 1
+        return page_numbers[idx]
     
     def _extract_clause_title(self, text: str) -> str:
         """Extract a title from the clause text"""
-        lines = text.split('\n')
-        first_line = lines[0].strip()
+        newline = text.find('\n')
+        first_line = (text[:newline] if newline != -1 else text).strip()
         
-        # If first line is short and looks like a title
-        if len(first_line.split()) <= 8:
+        # If first line is short and looks like a title; splitting stops once a ninth word is seen
+        if len(first_line.split(None, 8)) <= 8:
             return first_line
         
         # Try to extract from common patterns
-        for pattern in self.clause_patterns:
-            match = re.match(pattern, first_line)
-            if match:
-                # Get text after the pattern
-                remainder = first_line[match.end():].strip()
-                if remainder:
-                    return remainder[:50] + ("..." if len(remainder) > 50 else "")
+        match = self._clause_title_re.match(first_line)
+        if match:
+            # Get text after the pattern
+            remainder = first_line[match.end():].strip()
+            if remainder:
+                return remainder[:50] + ("..." if len(remainder) > 50 else "")
         
         # Default: use first few words
         words = first_line.split()
@@ -274,18 +316,42 @@ class PDFProcessor:
         if method == 'auto':
             method = 'documentai' if self.ocr_credentials_path else 'vision'
         
+        # Re-running OCR on the same file content returns the cached result without an API call
+        cache_key = (method, translate, self.ocr_processor_id, self._file_digest(file_path))
+        with self._ocr_cache_lock:
+            if cache_key in self._ocr_cache:
+                self._ocr_cache.move_to_end(cache_key)
+                return copy.deepcopy(self._ocr_cache[cache_key])
+        
         print(f"Processing with OCR using {method} method...")
         
         try:
             if method == 'documentai':
-                return self._process_with_document_ai(file_path, translate)
+                result = self._process_with_document_ai(file_path, translate)
             elif method == 'vision':
-                return self._process_with_vision_api(file_path)
+                result = self._process_with_vision_api(file_path)
             else:
                 raise Exception(f"Unknown OCR method: {method}")
                 
         except Exception as e:
             raise Exception(f"OCR processing failed: {str(e)}")
+        
+        # Callers may annotate the returned dict, so the cache keeps its own copy
+        with self._ocr_cache_lock:
+            self._ocr_cache[cache_key] = copy.deepcopy(result)
+            if len(self._ocr_cache) > _OCR_CACHE_SIZE:
+                self._ocr_cache.popitem(last=False)
+        
+        return result
+    
+    @staticmethod
+    def _file_digest(file_path: str) -> bytes:
+        """Content hash of a file, read in chunks"""
+        digest = blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.digest()
     
     def _process_with_document_ai(self, file_path: str, translate: bool = False) -> Dict[str, Any]:
         """Process document using Google Document AI"""
@@ -408,16 +474,21 @@ class PDFProcessor:
             doc = fitz.open(file_path)
             total_text_length = 0
             total_pages = len(doc)
+            pages_checked = min(3, total_pages)  # Check first 3 pages
             
-            for page_num in range(min(3, total_pages)):  # Check first 3 pages
-                page = doc[page_num]
-                page_text = page.get_text("text").strip()
-                total_text_length += len(page_text)
-            
-            doc.close()
+            try:
+                for page_num in range(pages_checked):
+                    page = doc[page_num]
+                    page_text = page.get_text("text").strip()
+                    total_text_length += len(page_text)
+                    # Enough text for the average to clear the threshold, so the rest need not be parsed
+                    if total_text_length >= 100 * pages_checked:
+                        return False
+            finally:
+                doc.close()
             
             # If there's very little text per page, it's likely scanned
-            avg_text_per_page = total_text_length / min(3, total_pages)
+            avg_text_per_page = total_text_length / pages_checked
             return avg_text_per_page < 100  # Less than 100 characters per page suggests scanned
             
         except Exception:
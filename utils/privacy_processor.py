@@ -1,53 +1,163 @@
 import google.cloud.dlp_v2
 from google.api_core.exceptions import GoogleAPICallError
+from google.api_core import retry as api_retry
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import base64
+import binascii
 import os
+import threading
+
+# AES-GCM nonce size recommended by NIST SP 800-38D
+GCM_NONCE_BYTES = 12
+
+# AES-256 key length; AES_KEY must decode to exactly this many bytes
+AES_KEY_BYTES = 32
+
+# Every Fernet token starts with this (version byte 0x80 and a timestamp high word of zero)
+FERNET_TOKEN_PREFIX = "gAAAAA"
+
+# DLP rejects requests over 0.5 MB, so batches are split below that with room for the table framing
+DLP_MAX_BATCH_BYTES = 450_000
+
+# Transient DLP failures (unavailable, deadline exceeded, ...) are retried with exponential backoff
+DLP_RETRY = api_retry.Retry(predicate=api_retry.if_transient_error, initial=0.5, maximum=8.0)
 
 class PrivacyProcessor:
-    def __init__(self, project_id, dp_sigma=0.2):
+    # Credential discovery and the gRPC channel are set up once per process and shared by all processors
+    _shared_dlp_client = None
+    _shared_dlp_client_lock = threading.Lock()
+
+    def __init__(self, project_id, dp_sigma=0.2, dlp_workers=8):
         """
         Initialize Privacy Processor with:
         - project_id: GCP Project ID
         - dp_sigma: standard deviation for Gaussian noise (lower = less deviation)
+        - dlp_workers: concurrent DLP calls made by redact_many
         """
         self.project_id = project_id
-        self.dlp_client = google.cloud.dlp_v2.DlpServiceClient()
+        self.dlp_client = self._get_dlp_client()
         self.dp_sigma = dp_sigma  # controls privacy/utility tradeoff
+        # Per-instance PCG64 generator, instead of the legacy global Mersenne Twister state
+        self._rng = np.random.default_rng()
+        self._dlp_workers = dlp_workers
+
+        # DLP configs are identical for every call, so they are built and marshalled to protobuf once
+        self._inspect_config = google.cloud.dlp_v2.InspectConfig(
+            info_types=[
+                google.cloud.dlp_v2.InfoType(name=name)
+                for name in (
+                    "PERSON_NAME",
+                    "PHONE_NUMBER",
+                    "EMAIL_ADDRESS",
+                    "US_SOCIAL_SECURITY_NUMBER",
+                    "CREDIT_CARD_NUMBER",
+                )
+            ],
+            min_likelihood=google.cloud.dlp_v2.Likelihood.LIKELY,
+            include_quote=True,
+        )
+
+        # Pseudonymization transformation
+        self._deidentify_config = google.cloud.dlp_v2.DeidentifyConfig(
+            info_type_transformations=google.cloud.dlp_v2.InfoTypeTransformations(
+                transformations=[
+                    google.cloud.dlp_v2.InfoTypeTransformations.InfoTypeTransformation(
+                        primitive_transformation=google.cloud.dlp_v2.PrimitiveTransformation(
+                            replace_with_info_type_config=google.cloud.dlp_v2.ReplaceWithInfoTypeConfig()
+                        )
+                    )
+                ]
+            )
+        )
 
         # AES key generation (or load from environment variable)
         key_env = os.getenv("AES_KEY")
         if key_env:
-            self.aes_key = key_env.encode()
+            self.aes_key = self._decode_aes_key(key_env)
+            # Text encrypted before the switch to AES-GCM is a Fernet token under the same 32-byte key
+            self._legacy_fernet = Fernet(base64.urlsafe_b64encode(self.aes_key))
         else:
-            self.aes_key = Fernet.generate_key()
+            self.aes_key = AESGCM.generate_key(bit_length=256)
+            self._legacy_fernet = None
             print("[WARN] AES_KEY not found in env. Generated temporary key.")
-        self.cipher = Fernet(self.aes_key)
+        self.cipher = AESGCM(self.aes_key)
+
+    @staticmethod
+    def _decode_aes_key(key_env):
+        """Decode AES_KEY (hex or base64) into a 256-bit key, refusing anything that is not exactly 32 bytes."""
+        key_env = key_env.strip()
+        try:
+            if len(key_env) == 2 * AES_KEY_BYTES:
+                key = bytes.fromhex(key_env)
+            else:
+                # Accepts both standard and URL-safe base64 (e.g. an existing Fernet key)
+                key = base64.b64decode(key_env.replace("-", "+").replace("_", "/"), validate=True)
+        except (ValueError, binascii.Error):
+            raise ValueError("AES_KEY must be a hex- or base64-encoded 32-byte key.") from None
+        if len(key) != AES_KEY_BYTES:
+            raise ValueError(
+                f"AES_KEY decodes to {len(key)} bytes; a 32-byte key is required "
+                "(generate one with: python -c \"import os, base64; print(base64.b64encode(os.urandom(32)).decode())\")."
+            )
+        return key
+
+    @classmethod
+    def _get_dlp_client(cls):
+        """Return the process-wide DLP client, creating it on first use."""
+        with cls._shared_dlp_client_lock:
+            if cls._shared_dlp_client is None:
+                cls._shared_dlp_client = google.cloud.dlp_v2.DlpServiceClient()
+            return cls._shared_dlp_client
 
     # ------------------------------------------
     # 1️⃣ Differential Privacy (Gaussian Noise)
     # ------------------------------------------
     def _apply_gaussian_noise(self, value):
         """Add small Gaussian noise to numeric values."""
-        try:
-            numeric_value = float(value)
-            noise = np.random.normal(0, self.dp_sigma)
-            return str(numeric_value + noise)
-        except ValueError:
-            # Not numeric, skip DP
-            return value
+        # Same sampler as the batched path, so there is a single noise distribution
+        return self._apply_gaussian_noise_to_words([value])[0]
+
+    def _apply_gaussian_noise_to_words(self, words):
+        """Add Gaussian noise to every numeric word, drawing all samples in one call."""
+        positions, values = [], []
+        for i, word in enumerate(words):
+            try:
+                values.append(float(word))
+            except ValueError:
+                # Not numeric, skip DP
+                continue
+            positions.append(i)
+
+        # Samples are drawn in float32, which is ample for noise at this scale, and added in float64
+        noise = self._rng.standard_normal(size=len(values), dtype=np.float32) * np.float32(self.dp_sigma)
+        noisy_values = (np.asarray(values) + noise).tolist()
+        noisy_words = list(words)
+        for i, noisy_value in zip(positions, noisy_values):
+            noisy_words[i] = str(noisy_value)
+        return noisy_words
 
     # ------------------------------------------
     # 2️⃣ AES Encryption & Decryption
     # ------------------------------------------
     def encrypt_text(self, text):
-        """Encrypt text using AES (Fernet) encryption."""
-        return self.cipher.encrypt(text.encode()).decode()
+        """Encrypt text using AES-256-GCM; the random nonce is prepended to the ciphertext."""
+        nonce = os.urandom(GCM_NONCE_BYTES)
+        ciphertext = self.cipher.encrypt(nonce, text.encode(), None)
+        return base64.urlsafe_b64encode(nonce + ciphertext).decode()
 
     def decrypt_text(self, encrypted_text):
-        """Decrypt AES-encrypted text."""
-        return self.cipher.decrypt(encrypted_text.encode()).decode()
+        """Decrypt AES-encrypted text, including Fernet tokens written by earlier versions."""
+        if self._legacy_fernet and encrypted_text.startswith(FERNET_TOKEN_PREFIX):
+            try:
+                return self._legacy_fernet.decrypt(encrypted_text.encode()).decode()
+            except InvalidToken:
+                # A GCM token can start with the same characters; try it as one below
+                pass
+        data = base64.urlsafe_b64decode(encrypted_text.encode())
+        return self.cipher.decrypt(data[:GCM_NONCE_BYTES], data[GCM_NONCE_BYTES:], None).decode()
 
     # ------------------------------------------
     # 3️⃣ DLP Redaction + Pseudonymization
@@ -60,45 +170,8 @@ class PrivacyProcessor:
         if not self.project_id:
             raise ValueError("Google Cloud project ID is not set.")
 
-        parent = f"projects/{self.project_id}"
-
-        item = {"value": text_to_redact}
-        info_types = [
-            {"name": "PERSON_NAME"},
-            {"name": "PHONE_NUMBER"},
-            {"name": "EMAIL_ADDRESS"},
-            {"name": "US_SOCIAL_SECURITY_NUMBER"},
-            {"name": "CREDIT_CARD_NUMBER"},
-        ]
-
-        inspect_config = {
-            "info_types": info_types,
-            "min_likelihood": "LIKELY",
-            "include_quote": True,
-        }
-
-        # Pseudonymization transformation
-        deidentify_config = {
-            "info_type_transformations": {
-                "transformations": [
-                    {
-                        "primitive_transformation": {
-                            "replace_with_info_type_config": {}
-                        }
-                    }
-                ]
-            }
-        }
-
-        request = {
-            "parent": parent,
-            "inspect_config": inspect_config,
-            "item": item,
-            "deidentify_config": deidentify_config,
-        }
-
         try:
-            response = self.dlp_client.deidentify_content(request=request)
+            response = self._deidentify({"value": text_to_redact})
             pseudonymized_text = response.item.value
             return pseudonymized_text
         except GoogleAPICallError as e:
@@ -108,6 +181,68 @@ class PrivacyProcessor:
             print(f"[ERROR] Unexpected error: {e}")
             return f"Unexpected error: {e}"
 
+    def redact_batch(self, texts):
+        """
+        Redact many texts with as few DLP calls as possible: each call carries
+        a one-column table with one row per text instead of a single value.
+        """
+        if not self.project_id:
+            raise ValueError("Google Cloud project ID is not set.")
+
+        results = []
+        for batch in self._split_batches(texts):
+            table = {
+                "headers": [{"name": "text"}],
+                "rows": [{"values": [{"string_value": text}]} for text in batch],
+            }
+            try:
+                response = self._deidentify({"table": table})
+                results.extend(row.values[0].string_value for row in response.item.table.rows)
+            except GoogleAPICallError as e:
+                print(f"[ERROR] DLP API call failed: {e}")
+                results.extend(f"Error during redaction: {e}" for _ in batch)
+            except Exception as e:
+                print(f"[ERROR] Unexpected error: {e}")
+                results.extend(f"Unexpected error: {e}" for _ in batch)
+        return results
+
+    def redact_many(self, texts):
+        """
+        Redact texts one DLP call each, overlapping the calls on a thread pool;
+        results come back in input order.
+        """
+        texts = list(texts)
+        if len(texts) <= 1:
+            return [self.redact_and_pseudonymize(text) for text in texts]
+        # DLP calls spend their time waiting on the network, with the GIL released
+        with ThreadPoolExecutor(max_workers=min(self._dlp_workers, len(texts))) as executor:
+            return list(executor.map(self.redact_and_pseudonymize, texts))
+
+    @staticmethod
+    def _split_batches(texts):
+        """Group texts into consecutive batches that stay under the DLP request size limit."""
+        batch, batch_bytes = [], 0
+        for text in texts:
+            text_bytes = len(text.encode())
+            if batch and batch_bytes + text_bytes > DLP_MAX_BATCH_BYTES:
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(text)
+            batch_bytes += text_bytes
+        if batch:
+            yield batch
+
+    def _deidentify(self, item):
+        """Send one content item (a value or a table) through DLP de-identification."""
+        request = google.cloud.dlp_v2.DeidentifyContentRequest(
+            parent=f"projects/{self.project_id}",
+            inspect_config=self._inspect_config,
+            item=item,
+            deidentify_config=self._deidentify_config,
+        )
+
+        return self.dlp_client.deidentify_content(request=request, retry=DLP_RETRY)
+
     # ------------------------------------------
     # 4️⃣ Combined Secure Processing Pipeline
     # ------------------------------------------
@@ -122,7 +257,7 @@ class PrivacyProcessor:
 
         # Apply DP only on numeric substrings
         words = redacted_text.split()
-        noisy_words = [self._apply_gaussian_noise(w) for w in words]
+        noisy_words = self._apply_gaussian_noise_to_words(words)
         dp_text = " ".join(noisy_words)
 
         encrypted_text = self.encrypt_text(dp_text)
@@ -1,16 +1,78 @@
 import re
 import json
 import os
+import copy
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Tuple
 from google import genai
 from google.genai import types
+from pydantic import BaseModel
 from .guardrails import InputValidator, ContentFilter, rate_limit
 
+# Gemini requests in flight at once per document; each is a blocking network round trip
+AI_ANALYSIS_CONCURRENCY = 8
+
+# Model and sampling settings for clause analysis; both are part of the response cache key
+_AI_MODEL = "gemini-2.5-pro"
+_AI_TEMPERATURE = 0.3
+
+# Maximum number of Gemini clause analyses kept per detector, keyed by a hash of the full request
+_AI_CACHE_SIZE = 256
+
+# Clauses shorter than this with no pattern-detected risk are scored without calling Gemini
+_AI_PREFILTER_MAX_CHARS = 200
+
+
+class RiskVerdict(BaseModel):
+    """Gemini's answer for one clause; passed as the response schema instead of a JSON template in the prompt"""
+    risk_score: int
+    risk_tags: List[str]
+    risk_summary: str
+    legal_disadvantages: str
+    privacy_concerns: str
+    unfair_terms: str
+    recommendations: str
 
 
 class RiskDetector:
     """Detects risky clauses in legal documents using AI-powered legal analysis"""
     
+    # Common problematic terms that flag a clause as a general risk
+    BASIC_RISK_KEYWORDS = (
+        'terminate', 'cancel', 'penalty', 'fee', 'breach', 'default', 
+        'liable', 'damages', 'exclusive', 'binding', 'waive', 'disclaim',
+        'modify', 'change', 'alter', 'update', 'revise'
+    )
+    
+    # All keywords as one alternation, so the clause is scanned once rather than once per keyword
+    _BASIC_RISK_RE = re.compile('|'.join(map(re.escape, BASIC_RISK_KEYWORDS)))
+    
+    # Sent with every clause, so kept terse; the field layout comes from RiskVerdict
+    _SYSTEM_PROMPT = (
+        "You are an expert legal analyst assessing contract clause risk. "
+        "Give risk_score as an integer 0-5, short risk_tags, and fill every schema field. "
+        "Consider: one-sided legal disadvantages; privacy and data protection; unfair termination; "
+        "excessive penalties or liability limits; jurisdiction; automatic renewal or binding terms; "
+        "unilateral change rights; exploitable vague language; fees and financial risk; "
+        "dispute resolution limits. Flag concrete disadvantages, not generic wording."
+    )
+    
+    # Per-clause request; only the title and text are filled in on each call
+    _USER_PROMPT_TEMPLATE = """Analyze this contract clause for legal risks and disadvantages:
+
+**CLAUSE TITLE:** {title}
+
+**CLAUSE TEXT:**
+{text}
+
+**ANALYSIS REQUEST:**
+Provide a comprehensive legal risk assessment focusing on actual legal disadvantages, 
+privacy risks, and unfair terms rather than just sentence patterns. Consider how this 
+clause could be used against one party and what legal protections it removes."""
+    
     def __init__(self):
         # Initialize Gemini client for AI-powered risk analysis
         api_key = os.environ.get("GEMINI_API_KEY")
@@ -21,6 +83,16 @@ class RiskDetector:
             self.client = None
             self.use_ai = False
             print("Warning: GEMINI_API_KEY not found, falling back to pattern-based analysis")
+        self._ai_cache = OrderedDict()
+        self._ai_cache_lock = threading.Lock()
+        
+        # Identical for every clause, so built once
+        self._generate_config = types.GenerateContentConfig(
+            system_instruction=self._SYSTEM_PROMPT,
+            response_mime_type="application/json",
+            response_schema=RiskVerdict,
+            temperature=_AI_TEMPERATURE
+        )
         self.risk_patterns = {
             'auto_renew': {
                 'patterns': [
@@ -92,6 +164,27 @@ class RiskDetector:
                 'rationale': "Broad termination rights create uncertainty and potential for abuse."
             }
         }
+        
+        # Flattened, compiled form of risk_patterns for the matching loop: one tuple per risk type of
+        # (risk_type, alternation of all its patterns, compiled patterns, score, rationale, threshold check or None).
+        # Clause text is lowercased and the patterns are all lowercase, so ASCII text is matched case-sensitively,
+        # which is several times faster; IGNORECASE stays for other text, where it also folds e.g. 'ſ' to 's'.
+        self._risk_rules_ascii = self._compile_risk_rules(0)
+        self._risk_rules = self._compile_risk_rules(re.IGNORECASE)
+    
+    def _compile_risk_rules(self, flags: int) -> Tuple[tuple, ...]:
+        """Compile risk_patterns into the flat rule tuples used by _pattern_analyze_clause"""
+        return tuple(
+            (
+                risk_type,
+                re.compile('|'.join(f'(?:{pattern})' for pattern in config['patterns']), flags),
+                tuple(re.compile(pattern, flags) for pattern in config['patterns']),
+                config['score'],
+                config['rationale'],
+                risk_type if config.get('threshold_check') else None,
+            )
+            for risk_type, config in self.risk_patterns.items()
+        )
     
     @rate_limit(max_requests=20, time_window=60)
     def analyze_document(self, document_data: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -114,6 +207,8 @@ class RiskDetector:
         
         print(f"Analyzing {len(clauses)} clauses...")
         
+        # Validate everything up front so the analyses can then run concurrently
+        valid_clauses = []
         for i, clause in enumerate(clauses):
             # Validate clause structure
             if not isinstance(clause, dict) or 'text' not in clause:
@@ -132,14 +227,45 @@ class RiskDetector:
             if has_forbidden:
                 print(f"Warning: Clause {i+1} contains potentially forbidden content")
             
-            risk_analysis = self._analyze_clause(clause)
-            print(f"Clause {i+1} '{clause['title'][:50]}...' - Score: {risk_analysis['score']}, Tags: {risk_analysis['tags']}")
+            valid_clauses.append((i, clause))
+        
+        # Repeated clauses (boilerplate, duplicated signature blocks) are analyzed once
+        unique_clauses = {}
+        clause_keys = []
+        for _, clause in valid_clauses:
+            key = hashlib.blake2b(
+                f"{clause.get('title', '')}\0{clause['text']}".encode('utf-8', 'surrogatepass'), digest_size=16
+            ).digest()
+            unique_clauses.setdefault(key, clause)
+            clause_keys.append(key)
+        
+        if self.use_ai and len(unique_clauses) > 1:
+            # Overlap the Gemini round trips; map keeps results in clause order
+            with ThreadPoolExecutor(max_workers=min(AI_ANALYSIS_CONCURRENCY, len(unique_clauses))) as executor:
+                unique_analyses = dict(zip(unique_clauses, executor.map(self._analyze_clause, unique_clauses.values())))
+        else:
+            unique_analyses = {key: self._analyze_clause(clause) for key, clause in unique_clauses.items()}
+        
+        # Every occurrence after the first gets its own copy of the shared result
+        analyses = []
+        seen_keys = set()
+        for key in clause_keys:
+            analysis = unique_analyses[key]
+            analyses.append(copy.deepcopy(analysis) if key in seen_keys else analysis)
+            seen_keys.add(key)
+        
+        # Per-clause results are written out in one go rather than one print per clause
+        log_lines = []
+        for (i, clause), risk_analysis in zip(valid_clauses, analyses):
+            log_lines.append(f"Clause {i+1} '{clause['title'][:50]}...' - Score: {risk_analysis['score']}, Tags: {risk_analysis['tags']}")
             
             if risk_analysis['score'] >= 1:  # Temporarily lower threshold for debugging
                 clause_with_risk = clause.copy()
                 clause_with_risk['risk_analysis'] = risk_analysis
                 risky_clauses.append(clause_with_risk)
         
+        if log_lines:
+            print("\n".join(log_lines))
         print(f"Found {len(risky_clauses)} risky clauses")
         
         # Sort by risk score (highest first)
@@ -151,6 +277,11 @@ class RiskDetector:
         """Analyze a single clause for risks using AI when available, fallback to pattern matching"""
         
         if self.use_ai:
+            # Short clauses without a single risk indicator (signature blocks, headings) skip the round trip
+            if len(clause['text']) < _AI_PREFILTER_MAX_CHARS:
+                pattern_analysis = self._pattern_analyze_clause(clause)
+                if pattern_analysis['score'] == 0:
+                    return pattern_analysis
             return self._ai_analyze_clause(clause)
         else:
             return self._pattern_analyze_clause(clause)
@@ -158,65 +289,33 @@ class RiskDetector:
     def _ai_analyze_clause(self, clause: Dict[str, Any]) -> Dict[str, Any]:
         """Use AI to analyze clause for legal risks and disadvantages"""
         try:
-            system_prompt = """You are an expert legal analyst specializing in contract risk assessment. 
-            Analyze the provided contract clause and identify all potential legal risks, disadvantages, 
-            privacy concerns, and unfair terms.
-            
-            Focus on:
-            1. Legal disadvantages to one party
-            2. Privacy and data protection risks  
-            3. Unfair termination conditions
-            4. Excessive penalties or liability limitations
-            5. Jurisdictional disadvantages
-            6. Automatic renewals or binding terms
-            7. Unilateral change rights
-            8. Vague or ambiguous language that could be exploited
-            9. Financial risks and fee structures
-            10. Dispute resolution limitations
-            
-            Respond with JSON in this exact format:
-            {
-                "risk_score": <integer from 0-5>,
-                "risk_tags": ["tag1", "tag2"],
-                "risk_summary": "Brief summary of main risks",
-                "legal_disadvantages": "Specific legal disadvantages identified",
-                "privacy_concerns": "Data privacy and protection issues",
-                "unfair_terms": "Terms that create imbalance between parties",
-                "recommendations": "How to address these risks"
-            }"""
-            
-            user_prompt = f"""Analyze this contract clause for legal risks and disadvantages:
-
-**CLAUSE TITLE:** {clause['title']}
-
-**CLAUSE TEXT:**
-{clause['text']}
-
-**ANALYSIS REQUEST:**
-Provide a comprehensive legal risk assessment focusing on actual legal disadvantages, 
-privacy risks, and unfair terms rather than just sentence patterns. Consider how this 
-clause could be used against one party and what legal protections it removes."""
+            user_prompt = self._USER_PROMPT_TEMPLATE.format(title=clause['title'], text=clause['text'])
 
             if not self.client:
                 return self._pattern_analyze_clause(clause)
+            
+            # Identical requests (boilerplate clauses) reuse the earlier answer instead of another API call
+            cache_key = hashlib.sha256(
+                "\0".join((_AI_MODEL, str(_AI_TEMPERATURE), self._SYSTEM_PROMPT, user_prompt)).encode()
+            ).digest()
+            with self._ai_cache_lock:
+                if cache_key in self._ai_cache:
+                    self._ai_cache.move_to_end(cache_key)
+                    return copy.deepcopy(self._ai_cache[cache_key])
                 
             response = self.client.models.generate_content(
-                model="gemini-2.5-pro",
+                model=_AI_MODEL,
                 contents=[
                     types.Content(role="user", parts=[types.Part(text=user_prompt)])
                 ],
-                config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    response_mime_type="application/json",
-                    temperature=0.3
-                ),
+                config=self._generate_config,
             )
             
             if response.text:
                 ai_analysis = json.loads(response.text)
                 
                 # Convert AI analysis to our expected format
-                return {
+                result = {
                     'score': ai_analysis.get('risk_score', 0),
                     'tags': ai_analysis.get('risk_tags', []),
                     'rationale': ai_analysis.get('risk_summary', ''),
@@ -226,6 +325,14 @@ clause could be used against one party and what legal protections it removes."""
                     'recommendations': ai_analysis.get('recommendations', '')
                 }
                 
+                # Only real AI answers are cached; callers may modify the returned dict, so the cache keeps its own copy
+                with self._ai_cache_lock:
+                    self._ai_cache[cache_key] = copy.deepcopy(result)
+                    if len(self._ai_cache) > _AI_CACHE_SIZE:
+                        self._ai_cache.popitem(last=False)
+                
+                return result
+                
         except Exception as e:
             print(f"AI analysis failed for clause '{clause['title']}': {str(e)}")
             return self._pattern_analyze_clause(clause)
@@ -242,51 +349,41 @@ clause could be used against one party and what legal protections it removes."""
         total_score = 0
         rationales = []
         
-        # Add some basic risk patterns for testing - check for common problematic terms
-        basic_risk_keywords = [
-            'terminate', 'cancel', 'penalty', 'fee', 'breach', 'default', 
-            'liable', 'damages', 'exclusive', 'binding', 'waive', 'disclaim',
-            'modify', 'change', 'alter', 'update', 'revise'
-        ]
-        
-        # Check for basic risk indicators first
-        basic_risk_found = any(keyword in text for keyword in basic_risk_keywords)
+        # Check for basic risk indicators first (common problematic terms, matched in the lowercased text)
+        basic_risk_found = self._BASIC_RISK_RE.search(text) is not None
         if basic_risk_found:
             tags.append('general_risk')
             total_score += 1
             rationales.append("Contains terms that may indicate contractual risk")
         
-        for risk_type, config in self.risk_patterns.items():
-            for pattern in config['patterns']:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
+        risk_rules = self._risk_rules_ascii if text.isascii() else self._risk_rules
+        for risk_type, any_pattern, patterns, score, rationale, threshold_check in risk_rules:
+            # No alternative matching anywhere means none of the type's patterns can match
+            if not any_pattern.search(text):
+                continue
+            
+            for pattern in patterns:
+                # Only the first match of each pattern is scored
+                match = pattern.search(text)
+                if match:
                     tags.append(risk_type)
-                    score_to_add = config['score']
+                    score_to_add = score
                     
                     # Special handling for threshold-based risks
-                    if config.get('threshold_check'):
-                        if risk_type == 'short_notice':
-                            days = self._extract_numbers_from_match(match)
-                            if days and min(days) < 30:
-                                score_to_add += 1  # Extra penalty for very short notice
-                        elif risk_type == 'high_penalty':
-                            percentages = self._extract_percentages_from_match(match)
-                            if percentages and max(percentages) > 10:
-                                score_to_add += 1  # Extra penalty for high percentages
+                    if threshold_check == 'short_notice':
+                        days = self._extract_numbers_from_match(match)
+                        if days and min(days) < 30:
+                            score_to_add += 1  # Extra penalty for very short notice
+                    elif threshold_check == 'high_penalty':
+                        percentages = self._extract_percentages_from_match(match)
+                        if percentages and max(percentages) > 10:
+                            score_to_add += 1  # Extra penalty for high percentages
                     
                     total_score += score_to_add
-                    rationales.append(config['rationale'])
-                    break  # Only count each risk type once per clause
+                    rationales.append(rationale)
         
-        # Remove duplicates while preserving order
-        seen_tags = set()
-        unique_tags = []
-        for tag in tags:
-            if tag not in seen_tags:
-                unique_tags.append(tag)
-                seen_tags.add(tag)
-        
-        # Remove duplicate rationales
+        # Remove duplicate tags and rationales while preserving order
+        unique_tags = list(dict.fromkeys(tags))
         unique_rationales = list(dict.fromkeys(rationales))
         
         return {
@@ -299,7 +396,7 @@ clause could be used against one party and what legal protections it removes."""
             'recommendations': ''
         }
     
-    def _extract_numbers_from_match(self, match) -> List[int]:
+    def _extract_numbers_from_match(self, match: re.Match) -> List[int]:
         """Extract numbers from a regex match"""
         numbers = []
         for group in match.groups():
@@ -310,7 +407,7 @@ clause could be used against one party and what legal protections it removes."""
                     continue
         return numbers
     
-    def _extract_percentages_from_match(self, match) -> List[float]:
+    def _extract_percentages_from_match(self, match: re.Match) -> List[float]:
         """Extract percentages from a regex match"""
         percentages = []
         for group in match.groups():
@@ -326,16 +423,23 @@ clause could be used against one party and what legal protections it removes."""
         if not risky_clauses:
             return {'total_score': 0, 'risk_distribution': {}, 'avg_score': 0}
         
-        total_score = sum(clause['risk_analysis']['score'] for clause in risky_clauses)
-        risk_distribution = {}
+        # One pass for the total, the tag counts and the first highest-scoring clause
+        total_score = 0
+        risk_distribution = Counter()
+        highest_risk_clause = None
+        highest_score = None
         
         for clause in risky_clauses:
-            for tag in clause['risk_analysis']['tags']:
-                risk_distribution[tag] = risk_distribution.get(tag, 0) + 1
+            risk_analysis = clause['risk_analysis']
+            score = risk_analysis['score']
+            total_score += score
+            risk_distribution.update(risk_analysis['tags'])
+            if highest_score is None or score > highest_score:
+                highest_risk_clause, highest_score = clause, score
         
         return {
             'total_score': total_score,
-            'risk_distribution': risk_distribution,
+            'risk_distribution': dict(risk_distribution),
             'avg_score': total_score / len(risky_clauses),
-            'highest_risk_clause': max(risky_clauses, key=lambda x: x['risk_analysis']['score'])
+            'highest_risk_clause': highest_risk_clause
         }
\ No newline at end of file